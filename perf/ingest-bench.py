@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Ingest benchmark: runs the Python ingest scripts against perf/ingest_fake.py
+over a generated file set and records throughput, request latency and
+memory for each.
+
+Usage:
+  python3 perf/ingest-bench.py
+  python3 perf/ingest-bench.py --files 500 --file-mb 4 --latency-ms 30 --error-rate 0.02
+  npm run ingest:bench -- --scenarios bulk,large --bandwidth-mbps 50
+  npm run ingest:bench -- --scenarios large,large-fixed --large-mb 64 --loss-per-mb 0.01
+
+large runs upload-large.py with adaptive TUS chunk sizes; large-fixed runs
+it with the fixed 6 MB chunks, for comparison. large-cached runs it once
+against a throwaway fake to fill its Drive download cache, then measures a
+second run that reads the files from the cache. clean-slate-packed uploads
+the sidecars only inside the packed manifest (--no-sidecar-files).
+
+Output (perf/runs/ingest_YYYY-MM-DD_HH-mm-ss/):
+  - report.json   config plus per-scenario files/s, MB/s, p50/p95 request
+                  latency, peak RSS and request counts by endpoint
+  - summary.md    the same as a markdown table
+  - <scenario>.log  script output
+
+Compare two runs with:
+  npm run ingest:compare -- --base perf/runs/<id1> --target perf/runs/<id2>
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+from ingest_fake import FakeSupabase, mp3_payload, start
+
+ROOT = Path(__file__).resolve().parent.parent
+SCRIPTS = ROOT / 'scripts'
+RUNS_DIR = ROOT / 'perf' / 'runs'
+
+SCENARIOS = ['bulk', 'bulk-adaptive', 'clean-slate', 'clean-slate-packed', 'large', 'large-fixed', 'large-cached']
+ENERGY_FOLDERS = ['low', 'medium', 'high']
+
+
+def generate_files(root: Path, count: int, file_mb: float, seed: int) -> Dict:
+    """Write count MP3-like files (sizes +/-20% around file_mb) and their sidecars."""
+    rng = random.Random(seed)
+    audio_dir = root / 'audio'
+    json_dir = root / 'json'
+    total = 0
+    for i in range(count):
+        relative = Path(ENERGY_FOLDERS[i % len(ENERGY_FOLDERS)]) / f'track_{i:05d}.mp3'
+        size = int(file_mb * 1024 * 1024 * rng.uniform(0.8, 1.2))
+        mp3_path = audio_dir / relative
+        mp3_path.parent.mkdir(parents=True, exist_ok=True)
+        # A unique trailing tag keeps every file distinct for deduplication
+        mp3_path.write_bytes(mp3_payload(size - 128) + b'TAG' + f'{seed}-{i}'.encode().ljust(125, b'\0'))
+
+        sidecar = {'title': f'Track {i}', 'artist': 'Bench', 'duration': round(size * 8 / 128000, 3)}
+        sidecar_path = json_dir / relative.with_suffix('.json')
+        sidecar_path.parent.mkdir(parents=True, exist_ok=True)
+        sidecar_path.write_text(json.dumps(sidecar))
+        total += size
+    return {'audio_dir': str(audio_dir), 'json_dir': str(json_dir), 'files': count, 'bytes': total}
+
+
+def scenario_command(name: str, args, file_set: Dict, work_dir: Path) -> List[str]:
+    python = args.python
+    if name == 'bulk':
+        return [python, str(SCRIPTS / 'bulk-upload-audio.py'), file_set['audio_dir'],
+                '--concurrency', str(args.concurrency)]
+    if name == 'bulk-adaptive':
+        return [python, str(SCRIPTS / 'bulk-upload-audio.py'), file_set['audio_dir'],
+                '--concurrency', str(args.concurrency), '--max-concurrency', str(args.max_concurrency)]
+    if name == 'clean-slate':
+        return [python, str(SCRIPTS / 'clean-slate-import.py'), file_set['audio_dir'], file_set['json_dir'],
+                '--journal', str(work_dir / 'clean-slate.journal.jsonl')]
+    if name == 'clean-slate-packed':
+        return [python, str(SCRIPTS / 'clean-slate-import.py'), file_set['audio_dir'], file_set['json_dir'],
+                '--journal', str(work_dir / 'clean-slate.journal.jsonl'), '--no-sidecar-files']
+    if name in ('large', 'large-cached'):
+        return [python, str(SCRIPTS / 'upload-large.py'), '--parallel', str(args.concurrency)]
+    if name == 'large-fixed':
+        return [python, str(SCRIPTS / 'upload-large.py'), '--parallel', str(args.concurrency), '--chunk-mb', '6']
+    raise ValueError(f'unknown scenario {name}')
+
+
+def peak_rss_mb(rusage) -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(rusage.ru_maxrss / scale, 1)
+
+
+def script_env(base_url: str) -> Dict[str, str]:
+    """Environment that points the scripts (and their Drive downloads) at a fake."""
+    return dict(os.environ,
+                SUPABASE_URL=base_url,
+                SUPABASE_SERVICE_ROLE_KEY='bench-service-role',
+                VITE_SUPABASE_ANON_KEY='bench-anon',
+                DRIVE_DOWNLOAD_URL=f'{base_url}/drive?export=download',
+                PYTHONUNBUFFERED='1')
+
+
+def warm_drive_cache(command: List[str], args, work_dir: Path, log):
+    """Run upload-large.py once in work_dir against a separate fault-free fake, filling its cache."""
+    fake = FakeSupabase(drive_size=int(args.large_mb * 1024 * 1024), seed=args.seed)
+    server, base_url = start(fake)
+    env = script_env(base_url)
+    try:
+        log.write('# warm-up run (fills the Drive cache, not measured)\n')
+        log.flush()
+        subprocess.run(command, cwd=work_dir, env=env, stdout=log, stderr=subprocess.STDOUT, check=False)
+        log.write('# measured run\n')
+        log.flush()
+    finally:
+        server.shutdown()
+
+
+def run_scenario(name: str, args, file_set: Dict, run_dir: Path) -> Dict:
+    fake = FakeSupabase(latency=args.latency_ms / 1000,
+                        bandwidth=args.bandwidth_mbps * 1024 * 1024 if args.bandwidth_mbps else None,
+                        error_rate=args.error_rate, drive_size=int(args.large_mb * 1024 * 1024),
+                        seed=args.seed, loss=args.loss_per_mb, corrupt_rate=args.corrupt_rate,
+                        capacity=args.capacity,
+                        drive_bandwidth=args.drive_mbps * 1024 * 1024 if args.drive_mbps else None)
+    server, base_url = start(fake)
+    work_dir = Path(tempfile.mkdtemp(prefix=f'ingest-bench-{name}-'))
+    env = script_env(base_url)
+    command = scenario_command(name, args, file_set, work_dir)
+
+    print(f'▶ {name}: {" ".join(command[1:])}')
+    try:
+        with open(run_dir / f'{name}.log', 'w') as log:
+            if name == 'large-cached':
+                warm_drive_cache(command, args, work_dir, log)
+            started = time.monotonic()
+            process = subprocess.Popen(command, cwd=work_dir, env=env, stdout=log, stderr=subprocess.STDOUT)
+            _, status, rusage = os.wait4(process.pid, 0)
+            seconds = time.monotonic() - started
+            process.returncode = os.waitstatus_to_exitcode(status)
+    finally:
+        server.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    with fake.lock:
+        uploaded = [size for size, _ in fake.objects.values()]
+        uploaded += [entry['offset'] for entry in fake.tus.values()
+                     if entry['length'] is not None and entry['offset'] == entry['length']]
+    files = len(uploaded)
+    total_bytes = sum(uploaded)
+
+    result = {
+        'exitCode': process.returncode,
+        'seconds': round(seconds, 3),
+        'files': files,
+        'bytes': total_bytes,
+        'filesPerSec': round(files / seconds, 2) if seconds else None,
+        'mbPerSec': round(total_bytes / (1024 * 1024) / seconds, 2) if seconds else None,
+        'peakRssMb': peak_rss_mb(rusage),
+        'requests': fake.stats(),
+    }
+    requests = result['requests']
+    print(f'  {files} files, {result["filesPerSec"]} files/s, {result["mbPerSec"]} MB/s, '
+          f'p50 {fmt_ms(requests["p50Ms"])} / p95 {fmt_ms(requests["p95Ms"])}, '
+          f'peak RSS {result["peakRssMb"]} MB, exit {process.returncode}')
+    return result
+
+
+def fmt_ms(value) -> str:
+    return 'N/A' if value is None else f'{value:.1f}ms'
+
+
+def markdown_summary(report: Dict) -> str:
+    config = report['config']
+    lines = [
+        '# Ingest Benchmark',
+        '',
+        f'Run `{report["runId"]}` at {report["timestamp"]}',
+        '',
+        f'{config["files"]} files of ~{config["fileMb"]} MB, latency {config["latencyMs"]}ms, '
+        f'bandwidth {config["bandwidthMbps"] or "unlimited"} MB/s '
+        f'(Drive {config["driveMbps"] or "unlimited"} MB/s), error rate {config["errorRate"]}, '
+        f'loss {config["lossPerMb"]}/MB, corrupt rate {config["corruptRate"]}, '
+        f'capacity {config["capacity"] or "unlimited"}, concurrency {config["concurrency"]}',
+        '',
+        '| Scenario | Exit | Files | Files/s | MB/s | P50 | P95 | Requests | Peak RSS |',
+        '|----------|------|-------|---------|------|-----|-----|----------|----------|',
+    ]
+    for name, data in report['summary']['scenarios'].items():
+        requests = data['requests']
+        lines.append(f'| {name} | {data["exitCode"]} | {data["files"]} | {data["filesPerSec"]} | '
+                     f'{data["mbPerSec"]} | {fmt_ms(requests["p50Ms"])} | {fmt_ms(requests["p95Ms"])} | '
+                     f'{requests["count"]} | {data["peakRssMb"]} MB |')
+    return '\n'.join(lines) + '\n'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Python ingest scripts against a local Supabase stand-in.')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f'comma-separated subset of {",".join(SCENARIOS)} (default: all)')
+    parser.add_argument('--files', type=int, default=200, help='generated MP3 files (default: 200)')
+    parser.add_argument('--file-mb', type=float, default=2.0, help='average MP3 size in MB (default: 2)')
+    parser.add_argument('--large-mb', type=float, default=8.0,
+                        help='size of each Drive file served to upload-large.py (default: 8)')
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help='--concurrency / --parallel passed to the scripts (default: 4)')
+    parser.add_argument('--max-concurrency', type=int, default=32,
+                        help='--max-concurrency for the bulk-adaptive scenario (default: 32)')
+    parser.add_argument('--latency-ms', type=float, default=10.0, help='latency added to each request (default: 10)')
+    parser.add_argument('--bandwidth-mbps', type=float, help='shared upload bandwidth cap in MB/s (default: none)')
+    parser.add_argument('--drive-mbps', type=float,
+                        help='shared Drive download bandwidth cap in MB/s for the large scenarios (default: none)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered 429/503')
+    parser.add_argument('--loss-per-mb', type=float, default=0.0,
+                        help='chance that each MB of a request body has the connection dropped')
+    parser.add_argument('--corrupt-rate', type=float, default=0.0,
+                        help='fraction of uploads the fake stores truncated while answering 200')
+    parser.add_argument('--capacity', type=int,
+                        help='Supabase requests the fake serves at once; more are answered 429')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--python', default=sys.executable, help='interpreter used to run the scripts')
+    parser.add_argument('--output', help='run directory (default: perf/runs/ingest_<timestamp>)')
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f'unknown scenarios: {", ".join(sorted(unknown))}')
+
+    now = datetime.now()
+    run_id = f'ingest_{now.strftime("%Y-%m-%d_%H-%M-%S")}'
+    run_dir = Path(args.output) if args.output else RUNS_DIR / run_id
+    run_dir.mkdir(parents=True, exist_ok=True)
+
+    data_dir = Path(tempfile.mkdtemp(prefix='ingest-bench-data-'))
+    try:
+        print(f'Generating {args.files} files (~{args.file_mb} MB each)...')
+        file_set = generate_files(data_dir, args.files, args.file_mb, args.seed)
+        results = {name: run_scenario(name, args, file_set, run_dir) for name in scenarios}
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    report = {
+        'runId': run_dir.name,
+        'timestamp': now.isoformat(),
+        'config': {
+            'files': args.files,
+            'fileMb': args.file_mb,
+            'largeMb': args.large_mb,
+            'concurrency': args.concurrency,
+            'latencyMs': args.latency_ms,
+            'bandwidthMbps': args.bandwidth_mbps,
+            'driveMbps': args.drive_mbps,
+            'errorRate': args.error_rate,
+            'lossPerMb': args.loss_per_mb,
+            'corruptRate': args.corrupt_rate,
+            'capacity': args.capacity,
+            'maxConcurrency': args.max_concurrency,
+            'seed': args.seed,
+            'python': args.python,
+        },
+        'summary': {'scenarios': results},
+    }
+    (run_dir / 'report.json').write_text(json.dumps(report, indent=2))
+    (run_dir / 'summary.md').write_text(markdown_summary(report))
+    print(f'\n📄 Report written to: {run_dir / "report.json"}')
+
+    if any(result['exitCode'] != 0 for result in results.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
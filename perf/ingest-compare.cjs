@@ -0,0 +1,396 @@
+#!/usr/bin/env node
+/**
+ * Ingest Benchmark Comparison CLI
+ *
+ * Compares two ingest benchmark runs (perf/ingest-bench.py) and produces a
+ * diff report per scenario.
+ *
+ * Usage:
+ *   node perf/ingest-compare.cjs --base perf/runs/<id1> --target perf/runs/<id2>
+ *   npm run ingest:compare -- --base perf/runs/ingest_2024-01-01_12-00-00 --target perf/runs/ingest_2024-01-02_12-00-00
+ *
+ * Output:
+ *   - Console summary
+ *   - comparison.md (markdown report for PR comments)
+ */
+
+const fs = require('fs');
+const path = require('path');
+
+// ============================================================================
+// COLORS
+// ============================================================================
+
+const colors = {
+  reset: '\x1b[0m',
+  bright: '\x1b[1m',
+  dim: '\x1b[2m',
+  green: '\x1b[32m',
+  yellow: '\x1b[33m',
+  red: '\x1b[31m',
+  cyan: '\x1b[36m',
+  gray: '\x1b[90m',
+  magenta: '\x1b[35m',
+  blue: '\x1b[34m',
+};
+
+// ============================================================================
+// METRICS
+// ============================================================================
+
+// [label, getter, unit, lowerIsBetter, regression threshold in %]
+const METRICS = [
+  ['Files/s', (s) => s.filesPerSec, '', false, 10],
+  ['MB/s', (s) => s.mbPerSec, '', false, 10],
+  ['P50 latency', (s) => s.requests.p50Ms, 'ms', true, 25],
+  ['P95 latency', (s) => s.requests.p95Ms, 'ms', true, 25],
+  ['Requests', (s) => s.requests.count, '', true, 10],
+  ['Peak RSS', (s) => s.peakRssMb, 'MB', true, 25],
+];
+
+// ============================================================================
+// HELPERS
+// ============================================================================
+
+function formatValue(value, unit) {
+  if (value === undefined || value === null || isNaN(value)) return 'N/A';
+  const rounded = Math.abs(value) >= 100 ? Math.round(value) : Math.round(value * 100) / 100;
+  return `${rounded}${unit}`;
+}
+
+function percentChange(before, after) {
+  return before ? ((after - before) / before) * 100 : 0;
+}
+
+function formatDiff(before, after, unit = '', lowerIsBetter = true) {
+  if (before === undefined || after === undefined || before === null || after === null) return 'N/A';
+
+  const diff = after - before;
+  const pctChange = percentChange(before, after);
+
+  let color;
+  let arrow;
+
+  if (Math.abs(pctChange) < 5) {
+    color = colors.gray;
+    arrow = '→';
+  } else if ((lowerIsBetter && diff < 0) || (!lowerIsBetter && diff > 0)) {
+    color = colors.green;
+    arrow = diff < 0 ? '↓' : '↑';
+  } else {
+    color = colors.red;
+    arrow = diff < 0 ? '↓' : '↑';
+  }
+
+  const sign = diff > 0 ? '+' : '';
+  return `${color}${arrow} ${sign}${formatValue(diff, unit)} (${sign}${pctChange.toFixed(1)}%)${colors.reset}`;
+}
+
+function formatDiffMd(before, after, unit = '', lowerIsBetter = true) {
+  if (before === undefined || after === undefined || before === null || after === null) return 'N/A';
+
+  const diff = after - before;
+  const pctChange = percentChange(before, after);
+
+  let emoji;
+
+  if (Math.abs(pctChange) < 5) {
+    emoji = '➡️';
+  } else if ((lowerIsBetter && diff < 0) || (!lowerIsBetter && diff > 0)) {
+    emoji = '🟢';
+  } else {
+    emoji = '🔴';
+  }
+
+  const sign = diff > 0 ? '+' : '';
+  return `${emoji} ${sign}${formatValue(diff, unit)} (${sign}${pctChange.toFixed(1)}%)`;
+}
+
+function parseArgs() {
+  const args = process.argv.slice(2);
+  const result = { base: null, target: null, output: null };
+
+  for (let i = 0; i < args.length; i++) {
+    if (args[i] === '--base' && args[i + 1]) {
+      result.base = args[i + 1];
+      i++;
+    } else if (args[i] === '--target' && args[i + 1]) {
+      result.target = args[i + 1];
+      i++;
+    } else if (args[i] === '--output' && args[i + 1]) {
+      result.output = args[i + 1];
+      i++;
+    }
+  }
+
+  return result;
+}
+
+function loadReport(dir) {
+  const reportPath = path.join(dir, 'report.json');
+
+  if (!fs.existsSync(reportPath)) {
+    throw new Error(`Report not found: ${reportPath}`);
+  }
+
+  const content = fs.readFileSync(reportPath, 'utf-8');
+  return JSON.parse(content);
+}
+
+// ============================================================================
+// COMPARISON LOGIC
+// ============================================================================
+
+function compareReports(base, target) {
+  const comparison = {
+    base: {
+      runId: base.runId,
+      timestamp: base.timestamp,
+      config: base.config,
+    },
+    target: {
+      runId: target.runId,
+      timestamp: target.timestamp,
+      config: target.config,
+    },
+    configChanges: [],
+    scenarios: {},
+    verdict: {
+      improved: false,
+      regressed: false,
+      issues: [],
+      improvements: [],
+    },
+  };
+
+  // Numbers are only comparable when the workload was the same
+  for (const key of Object.keys({ ...base.config, ...target.config })) {
+    if (key !== 'python' && JSON.stringify(base.config[key]) !== JSON.stringify(target.config[key])) {
+      comparison.configChanges.push({ key, before: base.config[key], after: target.config[key] });
+    }
+  }
+
+  const allScenarios = new Set([
+    ...Object.keys(base.summary.scenarios || {}),
+    ...Object.keys(target.summary.scenarios || {}),
+  ]);
+
+  for (const name of allScenarios) {
+    const baseData = base.summary.scenarios[name];
+    const targetData = target.summary.scenarios[name];
+    if (!baseData || !targetData) {
+      comparison.scenarios[name] = { missing: baseData ? 'target' : 'base' };
+      continue;
+    }
+
+    const metrics = [];
+    for (const [label, get, unit, lowerIsBetter, threshold] of METRICS) {
+      const before = get(baseData);
+      const after = get(targetData);
+      metrics.push({ label, before, after, unit, lowerIsBetter });
+
+      if (before === null || after === null || before === undefined || after === undefined) continue;
+      const pct = percentChange(before, after);
+      const worse = lowerIsBetter ? pct > threshold : pct < -threshold;
+      const better = lowerIsBetter ? pct < -threshold : pct > threshold;
+      if (worse) {
+        comparison.verdict.issues.push(`${name}: ${label} ${formatValue(before, unit)} → ${formatValue(after, unit)} (${pct.toFixed(1)}%)`);
+        comparison.verdict.regressed = true;
+      } else if (better) {
+        comparison.verdict.improvements.push(`${name}: ${label} ${formatValue(before, unit)} → ${formatValue(after, unit)} (${pct.toFixed(1)}%)`);
+        comparison.verdict.improved = true;
+      }
+    }
+
+    if (targetData.exitCode !== 0 && baseData.exitCode === 0) {
+      comparison.verdict.issues.push(`${name}: script now exits with ${targetData.exitCode}`);
+      comparison.verdict.regressed = true;
+    }
+
+    comparison.scenarios[name] = {
+      exitCode: { before: baseData.exitCode, after: targetData.exitCode },
+      metrics,
+    };
+  }
+
+  return comparison;
+}
+
+// ============================================================================
+// OUTPUT
+// ============================================================================
+
+function printComparison(comparison) {
+  console.log('');
+  console.log(`${colors.bright}${colors.cyan}╔══════════════════════════════════════════════════════════════════════════╗${colors.reset}`);
+  console.log(`${colors.bright}${colors.cyan}║              INGEST PERFORMANCE COMPARISON                                ║${colors.reset}`);
+  console.log(`${colors.bright}${colors.cyan}╚══════════════════════════════════════════════════════════════════════════╝${colors.reset}`);
+  console.log('');
+
+  console.log(`${colors.bright}Comparing:${colors.reset}`);
+  console.log(`  Base:   ${comparison.base.runId} (${comparison.base.timestamp})`);
+  console.log(`  Target: ${comparison.target.runId} (${comparison.target.timestamp})`);
+  console.log('');
+
+  if (comparison.configChanges.length > 0) {
+    console.log(`${colors.yellow}⚠️  Workload differs between runs:${colors.reset}`);
+    for (const change of comparison.configChanges) {
+      console.log(`  ${change.key}: ${change.before} → ${change.after}`);
+    }
+    console.log('');
+  }
+
+  for (const [name, data] of Object.entries(comparison.scenarios)) {
+    console.log(`${colors.bright}${colors.blue}${name}:${colors.reset}`);
+    if (data.missing) {
+      console.log(`  ${colors.gray}Not run in ${data.missing}${colors.reset}`);
+      console.log('');
+      continue;
+    }
+    for (const m of data.metrics) {
+      const label = `${m.label}:`.padEnd(14);
+      console.log(`  ${label}${formatValue(m.before, m.unit)} → ${formatValue(m.after, m.unit)}  ${formatDiff(m.before, m.after, m.unit, m.lowerIsBetter)}`);
+    }
+    console.log('');
+  }
+
+  console.log(`${colors.bright}Verdict:${colors.reset}`);
+  if (comparison.verdict.improvements.length > 0) {
+    console.log(`  ${colors.green}Improvements:${colors.reset}`);
+    for (const imp of comparison.verdict.improvements) {
+      console.log(`    ✅ ${imp}`);
+    }
+  }
+  if (comparison.verdict.issues.length > 0) {
+    console.log(`  ${colors.red}Regressions:${colors.reset}`);
+    for (const issue of comparison.verdict.issues) {
+      console.log(`    ❌ ${issue}`);
+    }
+  }
+  if (!comparison.verdict.improved && !comparison.verdict.regressed) {
+    console.log(`  ${colors.gray}No significant changes${colors.reset}`);
+  }
+  console.log('');
+}
+
+function generateMarkdownReport(comparison) {
+  const lines = [
+    `# Ingest Performance Comparison`,
+    ``,
+    `## Runs`,
+    ``,
+    `| | Run ID | Timestamp |`,
+    `|---|--------|-----------|`,
+    `| Base | ${comparison.base.runId} | ${comparison.base.timestamp} |`,
+    `| Target | ${comparison.target.runId} | ${comparison.target.timestamp} |`,
+    ``,
+  ];
+
+  if (comparison.configChanges.length > 0) {
+    lines.push(`> ⚠️ Workload differs between runs: ${comparison.configChanges.map((c) => `${c.key} ${c.before} → ${c.after}`).join(', ')}`);
+    lines.push(``);
+  }
+
+  for (const [name, data] of Object.entries(comparison.scenarios)) {
+    lines.push(`## ${name}`);
+    lines.push(``);
+    if (data.missing) {
+      lines.push(`Not run in ${data.missing}.`);
+      lines.push(``);
+      continue;
+    }
+    lines.push(`| Metric | Base | Target | Change |`);
+    lines.push(`|--------|------|--------|--------|`);
+    for (const m of data.metrics) {
+      lines.push(`| ${m.label} | ${formatValue(m.before, m.unit)} | ${formatValue(m.after, m.unit)} | ${formatDiffMd(m.before, m.after, m.unit, m.lowerIsBetter)} |`);
+    }
+    lines.push(``);
+  }
+
+  lines.push(`## Verdict`);
+  lines.push(``);
+
+  if (comparison.verdict.improvements.length > 0) {
+    lines.push(`### ✅ Improvements`);
+    for (const imp of comparison.verdict.improvements) {
+      lines.push(`- ${imp}`);
+    }
+    lines.push(``);
+  }
+
+  if (comparison.verdict.issues.length > 0) {
+    lines.push(`### ❌ Regressions`);
+    for (const issue of comparison.verdict.issues) {
+      lines.push(`- ${issue}`);
+    }
+    lines.push(``);
+  }
+
+  if (!comparison.verdict.improved && !comparison.verdict.regressed) {
+    lines.push(`➡️ No significant changes detected.`);
+  }
+
+  return lines.join('\n');
+}
+
+// ============================================================================
+// MAIN
+// ============================================================================
+
+function main() {
+  const args = parseArgs();
+
+  if (!args.base || !args.target) {
+    console.log('');
+    console.log('Usage: node perf/ingest-compare.cjs --base <dir> --target <dir>');
+    console.log('');
+    console.log('Example:');
+    console.log('  npm run ingest:compare -- --base perf/runs/ingest_2024-01-01_12-00-00 --target perf/runs/ingest_2024-01-02_12-00-00');
+    console.log('');
+    console.log('Options:');
+    console.log('  --base <dir>     Base run directory (the "before" state)');
+    console.log('  --target <dir>   Target run directory (the "after" state)');
+    console.log('  --output <dir>   Optional: directory to write comparison report');
+    console.log('');
+    process.exit(1);
+  }
+
+  // Load reports
+  let baseReport, targetReport;
+  try {
+    baseReport = loadReport(args.base);
+  } catch (error) {
+    console.error(`${colors.red}Error loading base report: ${error.message}${colors.reset}`);
+    process.exit(1);
+  }
+
+  try {
+    targetReport = loadReport(args.target);
+  } catch (error) {
+    console.error(`${colors.red}Error loading target report: ${error.message}${colors.reset}`);
+    process.exit(1);
+  }
+
+  // Compare
+  const comparison = compareReports(baseReport, targetReport);
+
+  // Print to console
+  printComparison(comparison);
+
+  // Generate markdown report
+  const markdownReport = generateMarkdownReport(comparison);
+
+  // Write to file
+  const outputDir = args.output || args.target;
+  const comparisonPath = path.join(outputDir, 'comparison.md');
+  fs.writeFileSync(comparisonPath, markdownReport);
+  console.log(`📄 Comparison report written to: ${comparisonPath}`);
+  console.log('');
+
+  // Exit with error if regressed
+  if (comparison.verdict.regressed) {
+    process.exit(1);
+  }
+}
+
+main();
@@ -0,0 +1,490 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Supabase endpoints the Python ingest scripts use.
+
+Serves enough of the storage, TUS and PostgREST APIs for scripts/*.py to
+run unmodified against it, plus a Google Drive style download endpoint for
+upload-large.py:
+
+  POST   /storage/v1/object/<bucket>/<path>     upload (body is counted, not kept)
+  POST   /storage/v1/object/copy                server-side copy
+  POST   /storage/v1/object/list/<bucket>       paged listing with folders
+  DELETE /storage/v1/object/<bucket>            batch delete by prefixes
+  POST   /storage/v1/upload/resumable           TUS create
+  HEAD   /storage/v1/upload/resumable/<id>      TUS offset
+  PATCH  /storage/v1/upload/resumable/<id>      TUS append
+  POST   /rest/v1/audio_tracks                  row upserts (counted)
+  GET    /drive?id=<id>                         MP3-like payload with an ETag, honours Range
+
+Every request can be slowed by a fixed latency, request bodies share a
+bandwidth cap (Drive downloads have their own), a fraction of requests can be answered with 429/503 to
+exercise the retry paths, and connections can drop part-way through a
+request body at a given rate per MB (loss), which costs the client the
+whole request. A fraction of uploads can also be stored corrupted (answered
+200 but kept one byte short, with a different ETag) to exercise the
+post-upload verification. With a capacity, Supabase requests beyond that
+many in flight at once are answered 429 with Retry-After, like a rate
+limited project. Per-request timings are kept for the benchmark report.
+
+Used by perf/ingest-bench.py; can also run on its own:
+  python3 perf/ingest_fake.py --port 54321 --latency-ms 20 --error-rate 0.02
+"""
+
+import argparse
+import hashlib
+import http.server
+import json
+import math
+import random
+import re
+import threading
+import time
+import urllib.parse
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+READ_SIZE = 64 * 1024
+MB = 1024 * 1024
+
+# One 128 kbps / 44.1 kHz stereo MPEG-1 Layer III frame, so generated files
+# look like CBR MP3s to the header scanner
+FRAME = b'\xff\xfb\x90\x00' + bytes(413)
+
+
+def mp3_payload(size: int, offset: int = 0) -> bytes:
+    """size bytes of repeated MP3 frames, starting offset bytes into the stream."""
+    start = offset % len(FRAME)
+    repeats = (start + size) // len(FRAME) + 1
+    return (FRAME * repeats)[start:start + size]
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Bandwidth:
+    """Shared cap on bytes per second across all connections."""
+
+    def __init__(self, rate: Optional[float]):
+        self.rate = rate
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, size: int):
+        if not self.rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._next = max(self._next, now) + size / self.rate
+            wait = self._next - now
+        time.sleep(wait)
+
+
+class ConnectionDropped(Exception):
+    pass
+
+
+class FakeSupabase:
+    """State and fault settings shared by all request handlers."""
+
+    def __init__(self, latency: float = 0.0, bandwidth: Optional[float] = None,
+                 error_rate: float = 0.0, drive_size: int = 8 * 1024 * 1024,
+                 retry_after: float = 0.1, seed: Optional[int] = None, loss: float = 0.0,
+                 corrupt_rate: float = 0.0, capacity: Optional[int] = None,
+                 drive_bandwidth: Optional[float] = None):
+        self.latency = latency
+        self.bandwidth = Bandwidth(bandwidth)
+        self.drive_bandwidth = Bandwidth(drive_bandwidth)
+        self.error_rate = error_rate
+        self.loss = loss
+        self.corrupt_rate = corrupt_rate
+        self.capacity = capacity
+        self.in_flight = 0
+        self.rejected = 0
+        self.drive_size = drive_size
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+
+        self.lock = threading.Lock()
+        self.objects: Dict[str, Tuple[int, str]] = {}
+        self.tus: Dict[str, Dict] = {}
+        self.rows = 0
+        self.timings: List[Tuple[str, float, int]] = []
+
+    def admit(self) -> bool:
+        """Count a Supabase request in; False if it is over capacity (and not counted)."""
+        with self.lock:
+            if self.capacity and self.in_flight >= self.capacity:
+                self.rejected += 1
+                return False
+            self.in_flight += 1
+            return True
+
+    def leave(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def drive_etag(self) -> str:
+        # Drive content only depends on its size here
+        return f'"drive-{self.drive_size:x}"'
+
+    def inject_error(self) -> Optional[int]:
+        if self.error_rate and self.random.random() < self.error_rate:
+            return self.random.choice([429, 503])
+        return None
+
+    def drop_point(self, length: int) -> Optional[int]:
+        """Byte at which a body of length bytes is cut off, or None if it arrives whole.
+
+        Drops arrive as a Poisson process, so each MB is lost with probability loss.
+        """
+        if not self.loss or not length:
+            return None
+        with self.lock:
+            point = self.random.expovariate(-math.log(1 - self.loss)) * MB
+        return int(point) if point < length else None
+
+    def record(self, endpoint: str, seconds: float, status: int):
+        with self.lock:
+            self.timings.append((endpoint, seconds, status))
+
+    def stats(self) -> Dict:
+        """Request counts and latency percentiles, overall and per endpoint."""
+        with self.lock:
+            timings = list(self.timings)
+            rows = self.rows
+
+        def summarise(entries):
+            latencies = [seconds * 1000 for _, seconds, _ in entries]
+            return {
+                'count': len(entries),
+                'errors': sum(1 for _, _, status in entries if status >= 400 or status == 0),
+                'p50Ms': percentile(latencies, 50),
+                'p95Ms': percentile(latencies, 95),
+            }
+
+        by_endpoint = {}
+        for entry in timings:
+            by_endpoint.setdefault(entry[0], []).append(entry)
+        return {
+            **summarise(timings),
+            'rowsUpserted': rows,
+            'overCapacity': self.rejected,
+            'byEndpoint': {name: summarise(entries) for name, entries in sorted(by_endpoint.items())},
+        }
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    fake: FakeSupabase = None
+
+    def log_message(self, *args):
+        pass
+
+    # ---- plumbing ---------------------------------------------------------
+
+    def read_body(self, keep: bool = True) -> bytes:
+        """Read the request body under the bandwidth cap; keep=False only hashes it.
+
+        Raises ConnectionDropped when the loss model cuts the body off.
+        """
+        chunks = []
+        self.body_size = 0
+        self.body_md5 = hashlib.md5()
+        drop = self.fake.drop_point(int(self.headers.get('Content-Length') or 0))
+
+        def take(size):
+            while size:
+                if drop is not None and self.body_size >= drop:
+                    raise ConnectionDropped()
+                block = self.rfile.read(min(size, READ_SIZE))
+                if not block:
+                    break
+                size -= len(block)
+                self.fake.bandwidth.consume(len(block))
+                self.body_size += len(block)
+                self.body_md5.update(block)
+                if keep:
+                    chunks.append(block)
+
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            while True:
+                size = int(self.rfile.readline().split(b';')[0], 16)
+                if not size:
+                    self.rfile.readline()
+                    break
+                take(size)
+                self.rfile.readline()
+        else:
+            take(int(self.headers.get('Content-Length') or 0))
+        return b''.join(chunks)
+
+    def reply(self, status: int, body=None, headers: Optional[Dict] = None):
+        data = b'' if body is None else json.dumps(body).encode()
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if body is not None:
+            self.send_header('Content-Type', 'application/json')
+        if 'Content-Length' not in (headers or {}):
+            self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(data)
+        self.status = status
+
+    def handle_request(self, endpoint: str, action, keep_body: bool = True):
+        start = time.monotonic()
+        self.status = 500
+        # Drive downloads are not part of the Supabase fault model
+        supabase = not endpoint.startswith('drive')
+        admitted = not supabase or self.fake.admit()
+        try:
+            body = self.read_body(keep_body and admitted)
+        except ConnectionDropped:
+            # Hang up without a reply; the rest of the body is never read
+            self.close_connection = True
+            self.fake.record(endpoint, time.monotonic() - start, 0)
+            if supabase and admitted:
+                self.fake.leave()
+            return
+        try:
+            if self.fake.latency:
+                time.sleep(self.fake.latency)
+            error = 429 if not admitted else self.inject_error_for(endpoint)
+            if error:
+                self.reply(error, {'error': 'injected'}, {'Retry-After': str(self.fake.retry_after)})
+            else:
+                action(body)
+        finally:
+            if supabase and admitted:
+                self.fake.leave()
+        self.fake.record(endpoint, time.monotonic() - start, self.status)
+
+    def inject_error_for(self, endpoint: str) -> Optional[int]:
+        return None if endpoint.startswith('drive') else self.fake.inject_error()
+
+    # ---- routing ----------------------------------------------------------
+
+    def do_POST(self):
+        path = urllib.parse.urlparse(self.path).path
+        if path == '/storage/v1/object/copy':
+            self.handle_request('object.copy', self.copy_object)
+        elif path.startswith('/storage/v1/object/list/'):
+            self.handle_request('object.list', self.list_objects)
+        elif path.startswith('/storage/v1/object/'):
+            key = urllib.parse.unquote(path.split('/', 5)[5])
+            self.handle_request('object.upload', lambda body: self.put_object(key), keep_body=False)
+        elif path == '/storage/v1/upload/resumable':
+            self.handle_request('tus.create', self.tus_create)
+        elif path == '/rest/v1/audio_tracks':
+            self.handle_request('rest.audio_tracks', self.upsert_rows)
+        else:
+            self.handle_request('unknown', lambda body: self.reply(404, {'error': 'not found'}))
+
+    def do_DELETE(self):
+        if self.path.startswith('/storage/v1/object/'):
+            self.handle_request('object.delete', self.delete_objects)
+        else:
+            self.handle_request('unknown', lambda body: self.reply(404, {'error': 'not found'}))
+
+    def do_HEAD(self):
+        if self.path.startswith('/storage/v1/upload/resumable/'):
+            self.handle_request('tus.head', self.tus_head)
+        elif self.path.startswith('/drive'):
+            self.handle_request('drive.head', lambda body: self.reply(
+                200, headers={'Content-Length': str(self.fake.drive_size), 'ETag': self.fake.drive_etag()}))
+        else:
+            self.handle_request('unknown', lambda body: self.reply(404))
+
+    def do_PATCH(self):
+        self.handle_request('tus.patch', self.tus_patch)
+
+    def do_GET(self):
+        if self.path.startswith('/drive'):
+            self.handle_request('drive.get', self.drive_get)
+        elif self.path == '/_stats':
+            self.reply(200, self.fake.stats())
+        else:
+            self.handle_request('unknown', lambda body: self.reply(404, {'error': 'not found'}))
+
+    # ---- storage ----------------------------------------------------------
+
+    def put_object(self, key: str):
+        with self.fake.lock:
+            exists = key in self.fake.objects
+            if exists and self.headers.get('x-upsert') != 'true':
+                self.reply(400, {'statusCode': '409', 'error': 'Duplicate', 'message': 'The resource already exists'})
+                return
+            if self.fake.corrupt_rate and self.fake.random.random() < self.fake.corrupt_rate:
+                self.fake.objects[key] = (max(0, self.body_size - 1), hashlib.md5(key.encode()).hexdigest())
+            else:
+                self.fake.objects[key] = (self.body_size, self.body_md5.hexdigest())
+        self.reply(200, {'Key': key})
+
+    def copy_object(self, body: bytes):
+        params = json.loads(body)
+        with self.fake.lock:
+            source = self.fake.objects.get(params['sourceKey'])
+            if source is None:
+                self.reply(404, {'error': 'not_found'})
+                return
+            self.fake.objects[params['destinationKey']] = source
+        self.reply(200, {'Key': params['destinationKey']})
+
+    def list_objects(self, body: bytes):
+        params = json.loads(body)
+        prefix = params.get('prefix', '').strip('/')
+        limit = params.get('limit', 100)
+        offset = params.get('offset', 0)
+
+        with self.fake.lock:
+            items = sorted(self.fake.objects.items())
+        entries = []
+        folders = set()
+        for key, (size, md5) in items:
+            if prefix and not key.startswith(prefix + '/'):
+                continue
+            rest = key[len(prefix) + 1:] if prefix else key
+            if '/' in rest:
+                folder = rest.split('/', 1)[0]
+                if folder not in folders:
+                    folders.add(folder)
+                    entries.append({'name': folder, 'id': None, 'metadata': None})
+            else:
+                entries.append({'name': rest, 'id': md5,
+                                'metadata': {'size': size, 'eTag': f'"{md5}"', 'mimetype': 'audio/mpeg'}})
+        self.reply(200, entries[offset:offset + limit])
+
+    def delete_objects(self, body: bytes):
+        removed = []
+        with self.fake.lock:
+            for key in json.loads(body).get('prefixes', []):
+                if self.fake.objects.pop(key, None) is not None:
+                    removed.append({'name': key})
+        self.reply(200, removed)
+
+    # ---- TUS --------------------------------------------------------------
+
+    def tus_create(self, body: bytes):
+        upload_id = uuid.uuid4().hex
+        length = self.headers.get('Upload-Length')
+        with self.fake.lock:
+            self.fake.tus[upload_id] = {'offset': 0, 'length': int(length) if length else None,
+                                        'md5': hashlib.md5()}
+        host = self.headers.get('Host')
+        self.reply(201, headers={'Location': f'http://{host}/storage/v1/upload/resumable/{upload_id}',
+                                 'Tus-Resumable': '1.0.0'})
+
+    def tus_entry(self) -> Optional[Dict]:
+        return self.fake.tus.get(self.path.rsplit('/', 1)[1])
+
+    def tus_head(self, body: bytes):
+        entry = self.tus_entry()
+        if entry is None:
+            self.reply(404)
+            return
+        headers = {'Upload-Offset': str(entry['offset']), 'Tus-Resumable': '1.0.0'}
+        if entry['length'] is not None:
+            headers['Upload-Length'] = str(entry['length'])
+        self.reply(200, headers=headers)
+
+    def tus_patch(self, body: bytes):
+        entry = self.tus_entry()
+        if entry is None:
+            self.reply(404)
+            return
+        with self.fake.lock:
+            if int(self.headers.get('Upload-Offset', -1)) != entry['offset']:
+                self.reply(409, {'error': 'offset mismatch'})
+                return
+            if self.headers.get('Upload-Length'):
+                entry['length'] = int(self.headers['Upload-Length'])
+            entry['offset'] += len(body)
+            entry['md5'].update(body)
+        self.reply(204, headers={'Upload-Offset': str(entry['offset']), 'Tus-Resumable': '1.0.0'})
+
+    # ---- REST and Drive ---------------------------------------------------
+
+    def upsert_rows(self, body: bytes):
+        rows = json.loads(body)
+        with self.fake.lock:
+            self.fake.rows += len(rows) if isinstance(rows, list) else 1
+        self.reply(201)
+
+    def drive_get(self, body: bytes):
+        size = self.fake.drive_size
+        start = 0
+        match = re.match(r'bytes=(\d+)-', self.headers.get('Range', ''))
+        if match and int(match.group(1)) < size:
+            start = int(match.group(1))
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{size - 1}/{size}')
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', 'audio/mpeg')
+        self.send_header('Content-Length', str(size - start))
+        self.send_header('ETag', self.fake.drive_etag())
+        self.end_headers()
+        block = mp3_payload(READ_SIZE * 4, start)
+        sent = start
+        try:
+            while sent < size:
+                piece = block[:size - sent]
+                self.fake.drive_bandwidth.consume(len(piece))
+                self.wfile.write(piece)
+                sent += len(piece)
+                block = mp3_payload(READ_SIZE * 4, sent)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+        self.status = 206 if start else 200
+
+
+class Server(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+
+def start(fake: FakeSupabase, port: int = 0) -> Tuple[Server, str]:
+    """Serve fake on a background thread. Returns (server, base URL)."""
+    handler = type('BoundHandler', (Handler,), {'fake': fake})
+    server = Server(('127.0.0.1', port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the local Supabase stand-in used by the ingest benchmark.')
+    parser.add_argument('--port', type=int, default=54321)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='added to every request')
+    parser.add_argument('--bandwidth-mbps', type=float, help='shared cap on upload bytes, in MB/s')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered 429/503')
+    parser.add_argument('--loss-per-mb', type=float, default=0.0,
+                        help='chance that each MB of a request body has the connection dropped')
+    parser.add_argument('--corrupt-rate', type=float, default=0.0,
+                        help='fraction of uploads stored truncated while still answering 200')
+    parser.add_argument('--capacity', type=int,
+                        help='Supabase requests served at once; more are answered 429')
+    parser.add_argument('--drive-mb', type=float, default=8.0, help='size of each /drive file')
+    parser.add_argument('--drive-mbps', type=float, help='shared cap on /drive download bytes, in MB/s')
+    args = parser.parse_args()
+
+    fake = FakeSupabase(latency=args.latency_ms / 1000,
+                        bandwidth=args.bandwidth_mbps * 1024 * 1024 if args.bandwidth_mbps else None,
+                        error_rate=args.error_rate, drive_size=int(args.drive_mb * 1024 * 1024),
+                        loss=args.loss_per_mb, corrupt_rate=args.corrupt_rate, capacity=args.capacity,
+                        drive_bandwidth=args.drive_mbps * 1024 * 1024 if args.drive_mbps else None)
+    server, url = start(fake, args.port)
+    print(f'Fake Supabase listening on {url} (GET /_stats for request timings)')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
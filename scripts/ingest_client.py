@@ -0,0 +1,281 @@
+"""
+Shared Supabase configuration and pooled HTTP client for the Python ingest scripts.
+
+Every script talks to the same project through one IngestClient, which keeps
+connections alive across requests and applies the same timeout and
+retry/backoff policy everywhere. Requests to the project also go through
+an adaptive concurrency controller (ingest_concurrency), which narrows the
+number in flight when storage pushes back; throttled requests wait their
+turn again instead of failing. Each request and retry is reported to
+ingest_metrics. HTTP/2 is used when httpx and h2 are
+installed (pip install 'httpx[http2]'); otherwise requests is used with a
+sized connection pool.
+
+Configuration comes from the environment (a .env file is loaded when
+python-dotenv is installed):
+  SUPABASE_URL or VITE_SUPABASE_URL        project URL
+  SUPABASE_SERVICE_ROLE_KEY                service role key (storage admin)
+  VITE_SUPABASE_ANON_KEY                   anon key
+There are no built-in defaults: a script exits with an error naming the
+variable it needs when that variable is unset.
+"""
+
+import os
+import random
+import sys
+import time
+from typing import Dict, Iterator, Optional
+
+from ingest_concurrency import ConcurrencyController
+from ingest_metrics import metrics
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+try:
+    import httpx
+    import h2  # noqa: F401 -- httpx needs it for HTTP/2
+except ImportError:
+    httpx = None
+    import requests
+
+# Supabase configuration
+SUPABASE_URL = os.getenv("SUPABASE_URL") or os.getenv("VITE_SUPABASE_URL")
+SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+ANON_KEY = os.getenv("VITE_SUPABASE_ANON_KEY")
+BUCKET_NAME = "audio-files"
+
+DEFAULT_POOL_SIZE = 32
+DEFAULT_TIMEOUT = 300.0   # seconds per request (read)
+CONNECT_TIMEOUT = 10.0
+DEFAULT_RETRIES = 3
+BACKOFF = 0.5             # first retry delay, doubled each attempt
+BACKOFF_MAX = 30.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+THROTTLE_STATUSES = {429, 503}
+THROTTLE_REQUEUES = 10    # times a throttled request is requeued before it counts as a retry
+
+if httpx is not None:
+    RequestError = httpx.TransportError
+else:
+    RequestError = requests.RequestException
+
+
+def require_config(value: Optional[str], name: str) -> str:
+    """Return a configuration value, exiting with a clear error if it is unset."""
+    if not value:
+        sys.exit(f"Error: {name} is not set; export it or add it to .env")
+    return value
+
+
+class StreamedResponse:
+    """A response whose body is read incrementally; close it when done."""
+
+    def __init__(self, response, closer):
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self._response = response
+        self._closer = closer
+
+    def iter_bytes(self, chunk_size: int) -> Iterator[bytes]:
+        if httpx is not None:
+            return self._response.iter_bytes(chunk_size)
+        return self._response.iter_content(chunk_size=chunk_size)
+
+    def raise_for_status(self):
+        self._response.raise_for_status()
+
+    def close(self):
+        self._closer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class IngestClient:
+    """Pooled, retrying HTTP client for Supabase storage and REST calls.
+
+    Paths starting with "/" are resolved against the project URL, and any
+    request to the project gets the apikey/Authorization headers. Absolute
+    URLs elsewhere (e.g. Google Drive) are sent without credentials.
+
+    Connection errors and 429/5xx responses are retried with exponential
+    backoff and jitter, honouring Retry-After. Bodies that cannot be replayed
+    (iterators) are sent once.
+
+    Project requests take a slot from controller (one is created, capped at
+    pool_size, if none is given). A 429/503 from the project is requeued
+    behind the controller, up to THROTTLE_REQUEUES times, without using up
+    the request's retries.
+    """
+
+    def __init__(self, api_key: Optional[str] = SERVICE_ROLE_KEY, base_url: Optional[str] = SUPABASE_URL,
+                 pool_size: int = DEFAULT_POOL_SIZE, retries: int = DEFAULT_RETRIES,
+                 timeout: float = DEFAULT_TIMEOUT, controller: Optional[ConcurrencyController] = None):
+        self.api_key = api_key
+        self.base_url = require_config(base_url, "SUPABASE_URL (or VITE_SUPABASE_URL)").rstrip("/")
+        self.retries = retries
+        self.timeout = timeout
+        self.controller = controller or ConcurrencyController(maximum=pool_size)
+
+        if httpx is not None:
+            self.http2 = True
+            self._client = httpx.Client(
+                http2=True,
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+                timeout=httpx.Timeout(timeout, connect=CONNECT_TIMEOUT),
+            )
+        else:
+            self.http2 = False
+            self._client = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+            self._client.mount("https://", adapter)
+            self._client.mount("http://", adapter)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._client.close()
+
+    def url(self, path: str) -> str:
+        return f"{self.base_url}{path}" if path.startswith("/") else path
+
+    def _headers(self, url: str, headers: Optional[Dict]) -> Dict:
+        merged = {}
+        if self.api_key and url.startswith(self.base_url):
+            merged["apikey"] = self.api_key
+            merged["Authorization"] = f"Bearer {self.api_key}"
+        merged.update(headers or {})
+        return merged
+
+    def _send(self, method, url, headers, json, body, files, timeout, stream):
+        if httpx is not None:
+            kwargs = {"headers": headers, "json": json, "files": files,
+                      "timeout": httpx.Timeout(timeout, connect=CONNECT_TIMEOUT)}
+            if hasattr(body, "read"):
+                # httpx iterates file objects by line; send fixed-size blocks instead
+                size = os.fstat(body.fileno()).st_size - body.tell()
+                kwargs["headers"] = dict(headers, **{"Content-Length": str(size)})
+                kwargs["content"] = iter(lambda: body.read(256 * 1024), b"")
+            elif isinstance(body, memoryview):
+                # httpx would iterate a memoryview item by item; send it in blocks
+                kwargs["headers"] = dict(headers, **{"Content-Length": str(body.nbytes)})
+                kwargs["content"] = (bytes(body[i:i + 256 * 1024]) for i in range(0, body.nbytes, 256 * 1024))
+            elif body is not None:
+                kwargs["content"] = body
+            if stream:
+                request = self._client.build_request(method, url, **{k: v for k, v in kwargs.items() if v is not None})
+                return self._client.send(request, stream=True)
+            return self._client.request(method, url, **{k: v for k, v in kwargs.items() if v is not None})
+
+        return self._client.request(method, url, headers=headers, json=json, data=body, files=files,
+                                    timeout=(CONNECT_TIMEOUT, timeout), stream=stream)
+
+    def request(self, method: str, path: str, *, headers: Optional[Dict] = None, json=None,
+                body=None, files=None, timeout: Optional[float] = None,
+                retries: Optional[int] = None, stream: bool = False):
+        """Send a request, retrying transient failures. Returns the response.
+
+        With stream=True the response body is left unread; use open_stream()
+        to get a StreamedResponse instead.
+        """
+        url = self.url(path)
+        headers = self._headers(url, headers)
+        timeout = timeout or self.timeout
+        retries = self.retries if retries is None else retries
+
+        # Only bytes, JSON and seekable files can be sent again
+        replayable = body is None or isinstance(body, (bytes, bytearray, memoryview, str)) \
+            or (hasattr(body, "seek") and hasattr(body, "tell"))
+        if not replayable or files is not None:
+            retries = 0
+        start = body.tell() if hasattr(body, "tell") else None
+        requeues = THROTTLE_REQUEUES if replayable and files is None else 0
+        controlled = url.startswith(self.base_url)
+        size = self._body_size(body)
+
+        attempt = 0
+        while True:
+            if start is not None:
+                body.seek(start)
+            slot = self.controller.acquire() if controlled else None
+            sent = time.monotonic()
+            try:
+                response = self._send(method, url, headers, json, body, files, timeout, stream)
+            except RequestError as e:
+                if slot is not None:
+                    self.controller.release(slot, method, url, None, size)
+                metrics.request(method, url, None, time.monotonic() - sent, error=str(e))
+                if attempt == retries:
+                    raise
+                delay = self._backoff(attempt, None)
+                attempt += 1
+                metrics.retry(method, url, attempt, type(e).__name__, delay)
+                time.sleep(delay)
+                continue
+
+            retry_after = self._retry_after(response.headers.get("Retry-After"))
+            if slot is not None:
+                self.controller.release(slot, method, url, response.status_code, size, retry_after)
+            metrics.request(method, url, response.status_code, time.monotonic() - sent)
+            if controlled and response.status_code in THROTTLE_STATUSES and requeues:
+                # Back into the queue; the controller holds everyone for Retry-After
+                requeues -= 1
+                delay = 0.0 if retry_after else self._backoff(THROTTLE_REQUEUES - requeues - 1, None)
+                metrics.retry(method, url, attempt + 1, f"HTTP {response.status_code} (requeued)", delay)
+                response.close()
+                time.sleep(delay)
+                continue
+            if response.status_code in RETRY_STATUSES and attempt < retries:
+                delay = self._backoff(attempt, retry_after)
+                attempt += 1
+                metrics.retry(method, url, attempt, f"HTTP {response.status_code}", delay)
+                response.close()
+                time.sleep(delay)
+                continue
+            return response
+
+    def open_stream(self, method: str, path: str, *, headers: Optional[Dict] = None,
+                    timeout: Optional[float] = None) -> StreamedResponse:
+        """Send a request and return its body as a StreamedResponse."""
+        response = self.request(method, path, headers=headers, timeout=timeout, stream=True)
+        return StreamedResponse(response, response.close)
+
+    @staticmethod
+    def _body_size(body) -> int:
+        if body is None:
+            return 0
+        if hasattr(body, "fileno"):
+            return os.fstat(body.fileno()).st_size - body.tell()
+        try:
+            return len(body)
+        except TypeError:
+            return 0
+
+    @staticmethod
+    def _retry_after(value: Optional[str]) -> Optional[float]:
+        """Retry-After in seconds; HTTP-date values are ignored."""
+        if value:
+            try:
+                return max(0.0, float(value))
+            except ValueError:
+                pass
+        return None
+
+    @staticmethod
+    def _backoff(attempt: int, retry_after: Optional[float]) -> float:
+        if retry_after is not None:
+            return min(BACKOFF_MAX, retry_after)
+        delay = min(BACKOFF_MAX, BACKOFF * 2 ** attempt)
+        return delay * random.uniform(0.5, 1.0)
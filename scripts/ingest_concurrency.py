@@ -0,0 +1,133 @@
+"""
+Adaptive (AIMD) concurrency control shared by the Python ingest scripts.
+
+IngestClient asks the controller for a slot before each request to the
+Supabase project and reports the outcome when the response arrives. The
+number of slots (the limit) follows TCP-style additive-increase /
+multiplicative-decrease:
+
+  - every successful request while the limit is in use adds 1/limit, so
+    the limit grows by about one per round of requests
+  - a 429/5xx or a dropped connection halves it, and a latency rise well
+    above the best seen for that kind of request cuts it by a tenth; only
+    one cut is made per round (signals from requests that were already in
+    flight at the last cut are ignored). Only small requests (listings,
+    deletes, row upserts, TUS HEADs) feed the latency signal, since an
+    upload's time mostly reflects its size
+  - Retry-After on a throttled response holds back every new request until
+    it expires, not just the one that was throttled
+
+Throttled requests are requeued by the client rather than failed, so
+scripts can push at their configured maximum and settle at the highest
+rate the backend tolerates.
+"""
+
+import threading
+import time
+from typing import Dict, Optional
+
+from ingest_metrics import metrics, request_category
+
+DEFAULT_INITIAL = 8
+DEFAULT_MAXIMUM = 32
+DECREASE_FACTOR = 0.5     # on 429/5xx or a dropped connection
+LATENCY_FACTOR = 0.9      # on a latency rise
+LATENCY_TOLERANCE = 2.0   # smoothed latency this many times the baseline counts as congestion
+LATENCY_SMOOTHING = 0.2   # EWMA weight of each new sample
+LATENCY_MAX_BODY = 64 * 1024  # larger request bodies are not latency samples
+BASELINE_DRIFT = 1.001    # lets the baseline creep up if the backend slows for good
+MAX_PAUSE = 60.0          # longest Retry-After honoured
+
+
+class ConcurrencyController:
+    """AIMD limit on requests in flight, shared by every thread of a script. Thread-safe."""
+
+    def __init__(self, initial: int = DEFAULT_INITIAL, minimum: int = 1, maximum: int = DEFAULT_MAXIMUM):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(max(minimum, min(initial, maximum)))
+        self.in_flight = 0
+        self.increases = 0
+        self.decreases = 0
+        self.throttled = 0
+        self.paused = 0.0
+        self._pause_until = 0.0
+        self._last_decrease = 0.0
+        self._latency: Dict[str, float] = {}
+        self._baseline: Dict[str, float] = {}
+        self._cond = threading.Condition()
+
+    def configure(self, initial: Optional[int] = None, maximum: Optional[int] = None):
+        """Reset the starting limit and/or the ceiling, e.g. from a script's --concurrency."""
+        with self._cond:
+            if maximum is not None:
+                self.maximum = max(self.minimum, maximum)
+            if initial is not None:
+                self.limit = float(initial)
+            self.limit = max(self.minimum, min(self.limit, self.maximum))
+            self._cond.notify_all()
+
+    def acquire(self) -> float:
+        """Wait for a slot (and for any Retry-After pause). Returns the start time to pass to release()."""
+        with self._cond:
+            while True:
+                wait = self._pause_until - time.monotonic()
+                if wait <= 0 and self.in_flight < int(self.limit):
+                    break
+                self._cond.wait(wait if wait > 0 else None)
+            self.in_flight += 1
+            return time.monotonic()
+
+    def release(self, started: float, method: str, url: str, status: Optional[int],
+                size: int = 0, retry_after: Optional[float] = None):
+        """Return a slot and adjust the limit from the outcome.
+
+        status is None for a transport error; size is the request body length.
+        """
+        now = time.monotonic()
+        seconds = now - started
+        congested = status is None or status == 429 or status >= 500
+        with self._cond:
+            busy = self.in_flight >= self.limit / 2
+            self.in_flight -= 1
+            if congested:
+                if status is not None:
+                    self.throttled += 1
+                if retry_after:
+                    until = now + min(retry_after, MAX_PAUSE)
+                    if until > self._pause_until:
+                        self.paused += until - max(now, self._pause_until)
+                        self._pause_until = until
+                self._decrease(started, now, DECREASE_FACTOR)
+            elif status < 400:
+                if size <= LATENCY_MAX_BODY and self._slow(request_category(method, url), seconds):
+                    self._decrease(started, now, LATENCY_FACTOR)
+                elif busy and self.limit < self.maximum:
+                    self.limit = min(self.maximum, self.limit + 1 / self.limit)
+                    self.increases += 1
+            self._cond.notify_all()
+
+    def _slow(self, category: str, seconds: float) -> bool:
+        latency = self._latency.get(category)
+        latency = seconds if latency is None else latency + LATENCY_SMOOTHING * (seconds - latency)
+        self._latency[category] = latency
+        baseline = min(latency, self._baseline.get(category, latency) * BASELINE_DRIFT)
+        self._baseline[category] = baseline
+        return latency > LATENCY_TOLERANCE * baseline
+
+    def _decrease(self, started: float, now: float, factor: float):
+        # One cut per round: requests sent before the last cut already saw the old limit
+        if started < self._last_decrease:
+            return
+        self._last_decrease = now
+        self.limit = max(self.minimum, self.limit * factor)
+        self.decreases += 1
+        metrics.observe('concurrency_limit', round(self.limit, 2))
+
+    def summary(self) -> str:
+        line = f"limit {self.limit:.1f} (max {self.maximum}), {self.decreases} cuts"
+        if self.throttled:
+            line += f", {self.throttled} throttled responses"
+        if self.paused:
+            line += f", paused {self.paused:.1f}s for Retry-After"
+        return line
@@ -0,0 +1,164 @@
+"""
+Buffered audio_tracks writer shared by the Python ingest scripts.
+
+Instead of one POST (and one transaction) per uploaded track, rows are
+collected and sent to PostgREST as array upserts keyed on file_path.
+"""
+
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from ingest_client import BUCKET_NAME, SUPABASE_URL, IngestClient, RequestError
+
+DEFAULT_MAX_ROWS = 500
+DEFAULT_MAX_WAIT = 5.0  # seconds a row may sit in the buffer
+ROW_ERROR_STATUSES = {400, 409, 422}  # a bad row; bisect to find it
+TOO_LARGE_STATUS = 413                # the batch is too big; halve it
+
+
+def public_url(storage_path: str) -> str:
+    """Public object URL, the form audio_tracks.file_path uses for sidecar imports."""
+    return f"{SUPABASE_URL}/storage/v1/object/public/{BUCKET_NAME}/{storage_path}"
+
+
+def sidecar_track_row(storage_path: str, track_id: str, sidecar: Dict,
+                      info: Optional[Dict] = None) -> Dict:
+    """Build an audio_tracks row from a parsed JSON sidecar.
+
+    Uses the same field mapping as populate-from-sidecars.ts. info is the
+    ingest_mp3 header metadata, used when the sidecar has no duration.
+    """
+    duration = sidecar.get('duration_seconds') or sidecar.get('duration') \
+        or (info['duration'] if info else 0)
+    return {
+        'file_path': public_url(storage_path),
+        'energy_level': 'medium',
+        'duration_seconds': round(duration),
+        'metadata': {
+            'track_id': track_id,
+            'track_name': sidecar.get('title') or sidecar.get('track_name') or track_id,
+            'artist_name': sidecar.get('artist') or sidecar.get('artist_name') or 'Focus.Music',
+            'duration': sidecar.get('duration'),
+            'duration_seconds': sidecar.get('duration_seconds'),
+            'bpm': sidecar.get('bpm'),
+            'key': sidecar.get('key'),
+            'genre': sidecar.get('genre'),
+            'file_size': sidecar.get('file_size'),
+            'mimetype': 'audio/mpeg',
+            **(info or {}),
+            **sidecar,
+        }
+    }
+
+
+class AudioTrackWriter:
+    """Buffers audio_tracks rows and upserts them in batches.
+
+    A batch is flushed once max_rows rows are buffered or the oldest row has
+    waited max_wait seconds. Rows whose file_path already exists update the
+    existing row. If PostgREST rejects a batch because of a bad row, it is
+    split in half and retried until the offending rows are isolated, so
+    failures are reported per row. A batch that is too large is halved until
+    it fits; any other error (auth, missing table, server) fails the whole
+    batch at once. Safe to use from several threads.
+    """
+
+    def __init__(self, client: IngestClient, max_rows: int = DEFAULT_MAX_ROWS,
+                 max_wait: float = DEFAULT_MAX_WAIT):
+        self.client = client
+        self.headers = {
+            'Content-Type': 'application/json',
+            'Prefer': 'resolution=merge-duplicates,return=minimal'
+        }
+        self.max_rows = max_rows
+        self.max_wait = max_wait
+
+        self.written = 0
+        self.requests = 0
+        self.failed: List[Tuple[Dict, str]] = []
+
+        self._rows: List[Dict] = []
+        self._oldest: Optional[float] = None
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._closed = False
+        self._timer = threading.Thread(target=self._flush_on_timer, daemon=True)
+        self._timer.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add(self, row: Dict):
+        with self._lock:
+            if not self._rows:
+                self._oldest = time.monotonic()
+                self._wake.notify()
+            self._rows.append(row)
+            full = len(self._rows) >= self.max_rows
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            rows, self._rows, self._oldest = self._rows, [], None
+        if rows:
+            with self._send_lock:
+                self._send(rows)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._wake.notify()
+        self._timer.join()
+        self.flush()
+
+    def _flush_on_timer(self):
+        with self._lock:
+            while not self._closed:
+                if self._oldest is None:
+                    self._wake.wait()
+                    continue
+                remaining = self._oldest + self.max_wait - time.monotonic()
+                if remaining > 0:
+                    self._wake.wait(remaining)
+                    continue
+                self._lock.release()
+                try:
+                    self.flush()
+                finally:
+                    self._lock.acquire()
+
+    def _send(self, rows: List[Dict]):
+        self.requests += 1
+        try:
+            response = self.client.request('POST', '/rest/v1/audio_tracks?on_conflict=file_path',
+                                           headers=self.headers, json=rows, timeout=60)
+            if response.status_code in [200, 201, 204]:
+                self.written += len(rows)
+                return
+            error = f'HTTP {response.status_code}: {response.text[:200]}'
+            # Only a bad row or an oversized batch is helped by splitting
+            split = response.status_code in ROW_ERROR_STATUSES or response.status_code == TOO_LARGE_STATUS
+        except RequestError as e:
+            error = str(e)
+            split = False
+
+        if split and len(rows) > 1:
+            middle = len(rows) // 2
+            self._send(rows[:middle])
+            self._send(rows[middle:])
+        else:
+            self.failed.extend((row, error) for row in rows)
+
+    def report(self):
+        """Print a summary of what reached the database."""
+        print(f"Database: {self.written} rows upserted in {self.requests} requests")
+        if self.failed:
+            print(f"Failed rows ({len(self.failed)}):")
+            for row, error in self.failed:
+                print(f"  - {row.get('file_path')}: {error}")
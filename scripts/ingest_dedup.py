@@ -0,0 +1,147 @@
+"""
+Content-hash deduplication shared by the Python ingest scripts.
+
+Source libraries often hold the same master in several folders (e.g.
+humdrum/low and humdrum/high). Files are grouped by size as they are
+discovered; a file is only hashed, in a process pool, once another file of
+the same size turns up. Each unique payload is uploaded once and every other path with the
+same content is created with a server-side storage copy.
+"""
+
+import hashlib
+from collections import defaultdict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+
+from ingest_client import BUCKET_NAME, IngestClient
+from ingest_metrics import metrics
+
+READ_SIZE = 1024 * 1024
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(READ_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class StreamingDeduper:
+    """Finds files whose content matches an earlier file while discovery goes on.
+
+        with StreamingDeduper() as deduper:
+            for path, size in discovered:
+                if not deduper.add(path, size):
+                    upload(path)              # no other file has its size
+                for path, source in deduper.settled():
+                    ...                       # copy from source, or upload if None
+            for path, source in deduper.settled(wait=True):
+                ...
+
+    The first file of a given size costs nothing. When a second one
+    arrives, both are hashed in a process pool, so the caller can keep
+    discovering and uploading other files; a library without repeated
+    sizes is never read twice and never starts the pool.
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        self.digests: Dict[Path, str] = {}
+        self._workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._by_size: Dict[int, List[Path]] = defaultdict(list)
+        self._hashing: Dict[Path, Future] = {}
+        self._pending: Deque[Tuple[Path, List[Path]]] = deque()
+
+    def __enter__(self) -> "StreamingDeduper":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add(self, path: Path, size: int) -> bool:
+        """Record a discovered file.
+
+        Returns False if no earlier file has its size (it is unique so far).
+        Otherwise returns True, and the file's result comes from settled().
+        """
+        same_size = self._by_size[size]
+        same_size.append(path)
+        if len(same_size) == 1:
+            return False
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self._workers)
+        for candidate in same_size:
+            if candidate not in self._hashing:
+                self._hashing[candidate] = self._pool.submit(file_sha256, candidate)
+        self._pending.append((path, list(same_size)))
+        return True
+
+    def settled(self, wait: bool = False) -> Iterator[Tuple[Path, Optional[Path]]]:
+        """Yield (path, earlier file with the same content or None) for added files.
+
+        Files come out in the order they were added, each once its hash and
+        those of the earlier files of its size are done. With wait, blocks
+        until every added file has come out.
+        """
+        while self._pending:
+            path, group = self._pending[0]
+            if not wait and not all(self._hashing[candidate].done() for candidate in group):
+                return
+            self._pending.popleft()
+            with metrics.timer('hash'):
+                source = self._source(path, group)
+            yield path, source
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def _source(self, path: Path, group: List[Path]) -> Optional[Path]:
+        digest = self._digest(path)
+        if digest is None:
+            return None
+        for earlier in group[:-1]:
+            if self._digest(earlier) == digest:
+                return earlier
+        return None
+
+    def _digest(self, path: Path) -> Optional[str]:
+        if path not in self.digests:
+            try:
+                self.digests[path] = self._hashing[path].result()
+            except OSError:
+                # Unreadable here means the upload will report it; treat as unique
+                return None
+        return self.digests[path]
+
+
+def copy_object(client: IngestClient, source: str, destination: str,
+                upsert: bool = False) -> Tuple[bool, Optional[str]]:
+    """Copy a storage object within the bucket. Returns (ok, failure description)."""
+    headers = {"x-upsert": "true"} if upsert else {}
+    body = {"bucketId": BUCKET_NAME, "sourceKey": source, "destinationKey": destination}
+    try:
+        response = client.request("POST", "/storage/v1/object/copy", headers=headers, json=body, timeout=60)
+        if response.status_code in [200, 201]:
+            return True, None
+        return False, f"HTTP {response.status_code}: {response.text}"
+    except Exception as e:
+        return False, f"Exception: {str(e)}"
+
+
+class DedupStats:
+    """Running totals of uploads replaced by server-side copies."""
+
+    def __init__(self):
+        self.files = 0
+        self.bytes = 0
+
+    def add(self, size: int):
+        self.files += 1
+        self.bytes += size
+
+    def summary(self) -> str:
+        return (f"{self.files} duplicate files copied server-side, "
+                f"{self.bytes / (1024 * 1024):.2f} MB and {self.files} uploads skipped")
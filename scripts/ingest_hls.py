@@ -0,0 +1,264 @@
+"""
+Local HLS packaging for the Python ingest scripts.
+
+While an MP3 is still on the ingest box, ffmpeg packages it into the same
+four-rendition AAC ladder as scripts/hls-ladder (32/64/96/128 kbps, 6 s
+segments) with a master.m3u8 on top, and the files are uploaded to the
+audio-hls bucket under <track_id>/. This replaces the transcode-to-hls.ts
+pass that downloads every MP3 from storage again afterwards.
+
+Each track is a single ffmpeg run that decodes the MP3 once for all
+renditions, pinned to one thread, and as many run at once as there are
+cores. Finished packages are uploaded on a thread pool while later tracks
+are still encoding: segments in parallel, then the rendition playlists,
+then master.m3u8, so a visible master playlist means a complete package.
+"""
+
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ingest_client import IngestClient
+from ingest_metrics import metrics
+
+HLS_BUCKET = "audio-hls"
+SEGMENT_SECONDS = 6
+SAMPLE_RATE = 44100
+CHANNELS = 2
+# (rendition, AAC bitrate in kbps, BANDWIDTH advertised in master.m3u8)
+LADDER = [
+    ("low", 32, 48000),
+    ("medium", 64, 96000),
+    ("high", 96, 144000),
+    ("premium", 128, 192000),
+]
+FFMPEG_TIMEOUT = 600
+TRACK_UPLOADS = 4    # packages uploading at once
+FILE_UPLOADS = 16    # segment/playlist requests in flight across all packages
+
+CONTENT_TYPES = {".m3u8": "application/vnd.apple.mpegurl", ".ts": "video/mp2t"}
+
+
+def ffmpeg_available() -> bool:
+    return shutil.which("ffmpeg") is not None
+
+
+def ffmpeg_command(source: str, output_dir: str) -> List[str]:
+    """One ffmpeg run writing every rendition of the ladder from a single decode."""
+    command = ["ffmpeg", "-nostdin", "-loglevel", "error", "-y", "-threads", "1", "-i", source]
+    for name, kbps, _ in LADDER:
+        command += [
+            "-map", "0:a:0",
+            "-c:a", "aac",
+            "-b:a", f"{kbps}k",
+            "-ac", str(CHANNELS),
+            "-ar", str(SAMPLE_RATE),
+            "-f", "hls",
+            "-hls_time", str(SEGMENT_SECONDS),
+            "-hls_playlist_type", "vod",
+            "-hls_segment_filename", os.path.join(output_dir, name, "segment_%03d.ts"),
+            os.path.join(output_dir, name, "index.m3u8"),
+        ]
+    return command
+
+
+def master_playlist() -> str:
+    lines = ["#EXTM3U", "#EXT-X-VERSION:3", ""]
+    for name, kbps, bandwidth in LADDER:
+        lines += [
+            f"# {kbps} kbps {name.upper()}",
+            f'#EXT-X-STREAM-INF:BANDWIDTH={bandwidth},CODECS="mp4a.40.2"',
+            f"{name}/index.m3u8",
+            "",
+        ]
+    return "\n".join(lines)
+
+
+def package_track(source: str, output_dir: str) -> Tuple[List[str], int]:
+    """Package source into output_dir.
+
+    Returns (files relative to output_dir in upload order, segments per
+    rendition). Raises RuntimeError if ffmpeg fails.
+    """
+    for name, _, _ in LADDER:
+        os.makedirs(os.path.join(output_dir, name), exist_ok=True)
+    try:
+        result = subprocess.run(ffmpeg_command(source, output_dir), capture_output=True,
+                                text=True, timeout=FFMPEG_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        raise RuntimeError(f"ffmpeg: {e}")
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip()[-500:] or f"ffmpeg exited with {result.returncode}")
+
+    with open(os.path.join(output_dir, "master.m3u8"), "w", encoding="utf-8") as f:
+        f.write(master_playlist())
+
+    segments = {
+        name: sorted(f"{name}/{entry}" for entry in os.listdir(os.path.join(output_dir, name))
+                     if entry.endswith(".ts"))
+        for name, _, _ in LADDER
+    }
+    files = [path for name, _, _ in LADDER for path in segments[name]]
+    files += [f"{name}/index.m3u8" for name, _, _ in LADDER] + ["master.m3u8"]
+    return files, len(segments[LADDER[0][0]])
+
+
+def hls_columns(track_id: str, entry: Optional[Dict]) -> Dict:
+    """audio_tracks HLS columns for a track, from its journal entry (None if not packaged)."""
+    if not entry:
+        return {"hls_path": None, "hls_segment_count": None, "hls_transcoded_at": None}
+    return {
+        "hls_path": f"{track_id}/master.m3u8",
+        "hls_segment_count": entry["segments"],
+        "hls_transcoded_at": entry["at"],
+    }
+
+
+class HlsPackager:
+    """Packages tracks with ffmpeg and uploads each package as soon as it is ready.
+
+        with HlsPackager(client) as hls:
+            hls.submit(track_id, mp3_path, on_done)
+        # every package is uploaded (or in hls.failed) once the block exits
+
+    on_done(segments, finished_at) is called from a worker thread after a
+    track's master.m3u8 is uploaded. A track_id submitted again (the same
+    track under another folder) is packaged once; every submission's
+    on_done is called when that package is uploaded, straight away if it
+    already is.
+    """
+
+    def __init__(self, client: IngestClient, workers: Optional[int] = None):
+        self.client = client
+        self.packaged = 0
+        self.files = 0
+        self.failed: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._work_dir = tempfile.mkdtemp(prefix="ingest-hls-")
+        # ffmpeg does the CPU work in its own process; these threads only wait on it
+        self._encoders = ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1)
+        self._tracks = ThreadPoolExecutor(max_workers=TRACK_UPLOADS)
+        self._uploads = ThreadPoolExecutor(max_workers=FILE_UPLOADS)
+        self._pending = []
+        self._waiting: Dict[str, List[Optional[Callable[[int, str], None]]]] = {}
+        self._finished: Dict[str, Tuple[int, str]] = {}
+
+    def __enter__(self) -> "HlsPackager":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def submit(self, track_id: str, source: Path, on_done: Optional[Callable[[int, str], None]] = None):
+        with self._lock:
+            finished = self._finished.get(track_id)
+            if finished is None:
+                if track_id in self._waiting:
+                    self._waiting[track_id].append(on_done)
+                    return
+                if track_id in self.failed:
+                    return
+                self._waiting[track_id] = [on_done]
+        if finished is not None:
+            if on_done:
+                on_done(*finished)
+            return
+
+        output_dir = tempfile.mkdtemp(prefix=f"{track_id}-", dir=self._work_dir)
+        future = self._encoders.submit(self._encode, track_id, str(source), output_dir)
+        with self._lock:
+            self._pending.append(future)
+
+        def encoded(future):
+            packaged = future.result()
+            if packaged is not None:
+                upload = self._tracks.submit(self._upload, track_id, output_dir, *packaged)
+                with self._lock:
+                    self._pending.append(upload)
+
+        future.add_done_callback(encoded)
+
+    def close(self):
+        """Wait for every submitted track to be encoded and uploaded."""
+        self._encoders.shutdown(wait=True)
+        while True:
+            with self._lock:
+                pending, self._pending = self._pending, []
+            if not pending:
+                break
+            for future in pending:
+                future.result()
+        self._tracks.shutdown(wait=True)
+        self._uploads.shutdown(wait=True)
+        shutil.rmtree(self._work_dir, ignore_errors=True)
+
+    def _fail(self, track_id: str, error: str, output_dir: str):
+        with self._lock:
+            self.failed[track_id] = error
+            self._waiting.pop(track_id, None)
+        metrics.error("hls", track=track_id, detail=error)
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    def _encode(self, track_id: str, source: str, output_dir: str):
+        started = time.monotonic()
+        try:
+            files, segments = package_track(source, output_dir)
+        except (RuntimeError, OSError) as e:
+            self._fail(track_id, str(e), output_dir)
+            return None
+        metrics.observe("hls_encode_seconds", round(time.monotonic() - started, 3), track=track_id)
+        return files, segments
+
+    def _upload(self, track_id: str, output_dir: str, files: List[str], segments: int):
+        # Segments first, then rendition playlists, then the master playlist
+        stages = [
+            [path for path in files if path.endswith(".ts")],
+            [path for path in files if path.endswith("/index.m3u8")],
+            ["master.m3u8"],
+        ]
+        try:
+            for stage in stages:
+                results = list(self._uploads.map(
+                    lambda path: self._put(f"{track_id}/{path}", os.path.join(output_dir, path)), stage))
+                errors = [error for error in results if error]
+                if errors:
+                    self._fail(track_id, f"{len(errors)} uploads failed, first: {errors[0]}", output_dir)
+                    return
+        finally:
+            if track_id not in self.failed:
+                shutil.rmtree(output_dir, ignore_errors=True)
+
+        finished = (segments, datetime.now(timezone.utc).isoformat())
+        with self._lock:
+            self.packaged += 1
+            self.files += len(files)
+            self._finished[track_id] = finished
+            callbacks = self._waiting.pop(track_id)
+        for callback in callbacks:
+            if callback:
+                callback(*finished)
+
+    def _put(self, object_path: str, local_path: str) -> Optional[str]:
+        headers = {"Content-Type": CONTENT_TYPES[os.path.splitext(local_path)[1]], "x-upsert": "true"}
+        try:
+            with open(local_path, "rb") as f:
+                response = self.client.request("POST", f"/storage/v1/object/{HLS_BUCKET}/{object_path}",
+                                               headers=headers, body=f, timeout=120)
+            if response.status_code in [200, 201]:
+                return None
+            return f"{object_path}: HTTP {response.status_code}"
+        except Exception as e:
+            return f"{object_path}: {e}"
+
+    def summary(self) -> str:
+        line = f"{self.packaged} tracks packaged ({self.files} files uploaded to {HLS_BUCKET})"
+        if self.failed:
+            line += f", {len(self.failed)} failed"
+        return line
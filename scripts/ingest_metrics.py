@@ -0,0 +1,332 @@
+"""
+Structured progress and timing instrumentation for the Python ingest scripts.
+
+Scripts mark their phases (list, delete, hash, upload, db-write, ...) and
+finished files; IngestClient reports every request, retry and transport
+error. From that the module keeps:
+  - a live progress line (files, MB, rate, ETA) on stderr for the current phase
+  - an end-of-run report breaking time down by phase and request category,
+    plus the spread of any tuned values scripts observe (e.g. chunk sizes)
+  - optional sinks, configured from the environment:
+      INGEST_EVENTS_JSONL      append one JSON object per event to this file
+      INGEST_PROM_TEXTFILE     write Prometheus text-format metrics here at exit
+                               (for node_exporter's textfile collector)
+      INGEST_PROGRESS_SECONDS  progress line interval (default 10, 0 disables)
+"""
+
+import atexit
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import urllib.parse
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+DEFAULT_PROGRESS_SECONDS = 10.0
+
+
+def request_category(method: str, url: str) -> str:
+    """Which part of the ingest a request belongs to, for the time breakdown."""
+    path = urllib.parse.urlparse(url).path
+    if path.startswith('/rest/'):
+        return 'db-write'
+    if path.startswith('/storage/v1/object/list/'):
+        return 'list'
+    if path.startswith('/storage/v1/object/') and method == 'DELETE':
+        return 'delete'
+    if path.startswith('/storage/'):
+        return 'upload'
+    return 'download'
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+
+def format_seconds(seconds: float) -> str:
+    if seconds < 60:
+        return f"{seconds:.1f}s"
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    return f"{seconds // 60}m{seconds % 60:02d}s"
+
+
+class Phase:
+    """Counters for one phase of a run."""
+
+    def __init__(self, name: str, files: Optional[int], size: Optional[int]):
+        self.name = name
+        self.total_files = files
+        self.total_bytes = size
+        self.estimating = False
+        self.files = 0
+        self.failed = 0
+        self.bytes = 0
+        self.started = time.monotonic()
+        self.ended: Optional[float] = None
+
+    @property
+    def seconds(self) -> float:
+        return (self.ended or time.monotonic()) - self.started
+
+    def expect(self, files: int, size: int, final: bool = True):
+        """Update the expected totals, e.g. while files are still being discovered."""
+        self.total_files = files
+        self.total_bytes = size
+        self.estimating = not final
+
+    def progress(self) -> str:
+        elapsed = self.seconds
+        more = "+" if self.estimating else ""
+        line = f"[{self.name}] {self.files + self.failed}"
+        if self.total_files:
+            line += f"/{self.total_files}{more}"
+        line += f" files, {self.bytes / (1024 * 1024):.1f}"
+        if self.total_bytes:
+            line += f"/{self.total_bytes / (1024 * 1024):.1f}{more}"
+        line += " MB"
+        if elapsed > 0:
+            line += f", {self.bytes / (1024 * 1024) / elapsed:.2f} MB/s"
+
+        # ETA by bytes when the total is known, otherwise by file count
+        done, total = (self.bytes, self.total_bytes) if self.total_bytes else \
+            (self.files + self.failed, self.total_files)
+        if total and done:
+            line += f", ETA {format_seconds(elapsed * (total - done) / done)}"
+        return line
+
+
+class Metrics:
+    """Collects ingest events and fans them out to the configured sinks. Thread-safe."""
+
+    def __init__(self, script: str, events_path: Optional[str] = None,
+                 prom_path: Optional[str] = None,
+                 progress_seconds: float = DEFAULT_PROGRESS_SECONDS):
+        self.script = script
+        self.prom_path = prom_path
+        self.progress_seconds = progress_seconds
+        self.started = time.time()
+
+        self.phases: List[Phase] = []
+        self.current: Optional[Phase] = None
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[tuple, int] = defaultdict(int)
+        self.busy: Dict[str, float] = defaultdict(float)
+        self.retries: Dict[str, int] = defaultdict(int)
+        self.values: Dict[str, List[float]] = defaultdict(list)
+        self.errors = 0
+
+        self._lock = threading.Lock()
+        self._events = open(events_path, 'a', encoding='utf-8') if events_path else None
+        self._stop = threading.Event()
+        self._ticker: Optional[threading.Thread] = None
+        self._closed = False
+
+    @classmethod
+    def from_env(cls) -> "Metrics":
+        if multiprocessing.parent_process() is not None:
+            # Pool workers (hashing, header scans) report nothing themselves
+            return cls('worker', progress_seconds=0)
+        interval = os.getenv('INGEST_PROGRESS_SECONDS')
+        return cls(Path(sys.argv[0]).stem or 'ingest',
+                   events_path=os.getenv('INGEST_EVENTS_JSONL'),
+                   prom_path=os.getenv('INGEST_PROM_TEXTFILE'),
+                   progress_seconds=float(interval) if interval else DEFAULT_PROGRESS_SECONDS)
+
+    # ---- events -----------------------------------------------------------
+
+    def emit(self, event: str, **fields):
+        if self._events is None:
+            return
+        line = json.dumps({'ts': round(time.time(), 3), 'script': self.script, 'event': event, **fields})
+        with self._lock:
+            if self._events is not None:
+                self._events.write(line + "\n")
+                self._events.flush()
+
+    @contextmanager
+    def phase(self, name: str, files: Optional[int] = None, size: Optional[int] = None):
+        """Time a phase; files/size are the expected totals, used for the ETA."""
+        phase = Phase(name, files, size)
+        with self._lock:
+            self.phases.append(phase)
+            previous, self.current = self.current, phase
+        self.emit('phase_start', phase=name, files=files, bytes=size)
+        self._start_ticker()
+        try:
+            yield phase
+        finally:
+            phase.ended = time.monotonic()
+            with self._lock:
+                self.current = previous
+            self.emit('phase_end', phase=name, seconds=round(phase.seconds, 3),
+                      files=phase.files, failed=phase.failed, bytes=phase.bytes)
+
+    def file_done(self, path: str, size: int, ok: bool = True, seconds: Optional[float] = None,
+                  error: Optional[str] = None):
+        with self._lock:
+            phase = self.current
+            if phase is not None:
+                if ok:
+                    phase.files += 1
+                    phase.bytes += size
+                else:
+                    phase.failed += 1
+            if not ok:
+                self.errors += 1
+        self.emit('file', phase=phase.name if phase else None, path=str(path), bytes=size, ok=ok,
+                  seconds=round(seconds, 3) if seconds is not None else None, error=error)
+
+    @contextmanager
+    def timer(self, category: str):
+        """Count local work (hashing, header scans) towards a category's busy time."""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.busy[category] += time.monotonic() - start
+
+    def request(self, method: str, url: str, status: Optional[int], seconds: float,
+                error: Optional[str] = None):
+        category = request_category(method, url)
+        with self._lock:
+            self.latencies[category].append(seconds)
+            self.busy[category] += seconds
+            self.statuses[(category, status or 'error')] += 1
+        self.emit('request', method=method, path=urllib.parse.urlparse(url).path, category=category,
+                  status=status, ms=round(seconds * 1000, 1), error=error)
+
+    def retry(self, method: str, url: str, attempt: int, reason: str, delay: float):
+        category = request_category(method, url)
+        with self._lock:
+            self.retries[category] += 1
+        self.emit('retry', method=method, path=urllib.parse.urlparse(url).path, category=category,
+                  attempt=attempt, reason=reason, delay=round(delay, 3))
+
+    def observe(self, name: str, value: float, **fields):
+        """Record one sample of a tuned value (e.g. a chosen chunk size) for the report."""
+        with self._lock:
+            self.values[name].append(value)
+        self.emit('observe', name=name, value=value, **fields)
+
+    def error(self, message: str, **fields):
+        with self._lock:
+            self.errors += 1
+        self.emit('error', message=message, **fields)
+
+    # ---- live progress ----------------------------------------------------
+
+    def _start_ticker(self):
+        if self._ticker is None and self.progress_seconds > 0:
+            self._ticker = threading.Thread(target=self._tick, daemon=True)
+            self._ticker.start()
+
+    def _tick(self):
+        while not self._stop.wait(self.progress_seconds):
+            phase = self.current
+            if phase is not None:
+                print(phase.progress(), file=sys.stderr, flush=True)
+
+    # ---- reporting --------------------------------------------------------
+
+    def report(self):
+        """Print where the run's time went, by phase and by request category."""
+        print("\nTime breakdown:")
+        print(f"  {'phase':<14}{'wall':>10}{'files':>9}{'failed':>8}{'MB':>11}{'MB/s':>9}")
+        for phase in self.phases:
+            rate = phase.bytes / (1024 * 1024) / phase.seconds if phase.seconds else 0
+            print(f"  {phase.name:<14}{format_seconds(phase.seconds):>10}{phase.files:>9}{phase.failed:>8}"
+                  f"{phase.bytes / (1024 * 1024):>11.1f}{rate:>9.2f}")
+
+        categories = sorted(set(self.busy) | set(self.retries))
+        if categories:
+            print(f"\n  {'category':<14}{'busy':>10}{'requests':>10}{'p50':>9}{'p95':>9}{'retries':>9}")
+            for category in categories:
+                latencies = self.latencies.get(category, [])
+                p50, p95 = percentile(latencies, 50), percentile(latencies, 95)
+                print(f"  {category:<14}{self.busy[category]:>9.1f}s{len(latencies):>10}"
+                      f"{(f'{p50 * 1000:.0f}ms' if p50 is not None else '-'):>9}"
+                      f"{(f'{p95 * 1000:.0f}ms' if p95 is not None else '-'):>9}"
+                      f"{self.retries.get(category, 0):>9}")
+            print("  (busy = summed request/work time; overlaps when running in parallel)")
+
+        if self.values:
+            print(f"\n  {'value':<20}{'samples':>9}{'min':>12}{'p50':>12}{'p95':>12}{'max':>12}")
+            for name, values in sorted(self.values.items()):
+                print(f"  {name:<20}{len(values):>9}{min(values):>12g}{percentile(values, 50):>12g}"
+                      f"{percentile(values, 95):>12g}{max(values):>12g}")
+
+    def prometheus(self) -> str:
+        """Metrics in Prometheus text exposition format."""
+        script = self.script.replace('"', '')
+        lines = [
+            '# HELP ingest_phase_seconds Wall-clock time spent in each phase.',
+            '# TYPE ingest_phase_seconds gauge',
+        ]
+        for phase in self.phases:
+            lines.append(f'ingest_phase_seconds{{script="{script}",phase="{phase.name}"}} {phase.seconds:.3f}')
+        lines += ['# HELP ingest_files_total Files finished per phase.', '# TYPE ingest_files_total counter']
+        for phase in self.phases:
+            lines.append(f'ingest_files_total{{script="{script}",phase="{phase.name}",result="ok"}} {phase.files}')
+            lines.append(f'ingest_files_total{{script="{script}",phase="{phase.name}",result="failed"}} {phase.failed}')
+        lines += ['# HELP ingest_bytes_total Bytes transferred per phase.', '# TYPE ingest_bytes_total counter']
+        for phase in self.phases:
+            lines.append(f'ingest_bytes_total{{script="{script}",phase="{phase.name}"}} {phase.bytes}')
+        lines += ['# HELP ingest_requests_total HTTP requests by category and status.',
+                  '# TYPE ingest_requests_total counter']
+        for (category, status), count in sorted(self.statuses.items(), key=str):
+            lines.append(f'ingest_requests_total{{script="{script}",category="{category}",status="{status}"}} {count}')
+        lines += ['# HELP ingest_request_seconds Request latency by category.',
+                  '# TYPE ingest_request_seconds summary']
+        for category, latencies in sorted(self.latencies.items()):
+            for quantile in (50, 95):
+                lines.append(f'ingest_request_seconds{{script="{script}",category="{category}",'
+                             f'quantile="{quantile / 100}"}} {percentile(latencies, quantile):.6f}')
+            lines.append(f'ingest_request_seconds_sum{{script="{script}",category="{category}"}} {sum(latencies):.6f}')
+            lines.append(f'ingest_request_seconds_count{{script="{script}",category="{category}"}} {len(latencies)}')
+        lines += ['# HELP ingest_retries_total Retried requests by category.', '# TYPE ingest_retries_total counter']
+        for category, count in sorted(self.retries.items()):
+            lines.append(f'ingest_retries_total{{script="{script}",category="{category}"}} {count}')
+        for name, values in sorted(self.values.items()):
+            metric = f'ingest_{name}'
+            lines += [f'# HELP {metric} Samples of {name} chosen during the run.', f'# TYPE {metric} summary']
+            for quantile in (50, 95):
+                lines.append(f'{metric}{{script="{script}",quantile="{quantile / 100}"}} {percentile(values, quantile):g}')
+            lines.append(f'{metric}_sum{{script="{script}"}} {sum(values):g}')
+            lines.append(f'{metric}_count{{script="{script}"}} {len(values)}')
+        lines += ['# HELP ingest_errors_total Failed files and requests.', '# TYPE ingest_errors_total counter',
+                  f'ingest_errors_total{{script="{script}"}} {self.errors}',
+                  '# HELP ingest_last_run_timestamp_seconds When the run started.',
+                  '# TYPE ingest_last_run_timestamp_seconds gauge',
+                  f'ingest_last_run_timestamp_seconds{{script="{script}"}} {self.started:.0f}']
+        return "\n".join(lines) + "\n"
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._stop.set()
+        if self.prom_path:
+            # Write then rename so the collector never reads a partial file
+            tmp = f"{self.prom_path}.{os.getpid()}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write(self.prometheus())
+            os.replace(tmp, self.prom_path)
+        with self._lock:
+            events, self._events = self._events, None
+        if events is not None:
+            events.close()
+
+
+metrics = Metrics.from_env()
+atexit.register(metrics.close)
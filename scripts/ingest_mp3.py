@@ -0,0 +1,198 @@
+"""
+MP3 header scanner used by the Python ingest scripts to fill in real track
+metadata (duration, bitrate, sample rate, channels) on audio_tracks rows.
+
+Only headers are read: the ID3v2 tag is skipped by its declared size, the
+first MPEG frame header is parsed, and a Xing/Info or VBRI header (written
+by LAME and most encoders) supplies the exact frame count, so nothing is
+decoded. Files without one are treated as constant bitrate and timed from
+their audio size, which is exact for CBR. Directories are scanned across a
+process pool.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Sequence
+
+SCAN_SIZE = 64 * 1024  # bytes read after the ID3v2 tag to find the first frame
+
+# Bitrates in kbps, indexed by the 4-bit field (0 = free format, 15 = invalid)
+BITRATES = {
+    (1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+BITRATES[(2, 3)] = BITRATES[(2, 2)]
+SAMPLE_RATES = {1: [44100, 48000, 32000], 2: [22050, 24000, 16000], 2.5: [11025, 12000, 8000]}
+
+
+def id3v2_size(header: bytes) -> int:
+    """Bytes taken by an ID3v2 tag at the start of a file (0 if there is none)."""
+    if len(header) < 10 or header[:3] != b'ID3':
+        return 0
+    size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+    footer = 10 if header[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def parse_frame_header(data: bytes, pos: int) -> Optional[Dict]:
+    """Decode the 4-byte MPEG audio frame header at pos, or None if it isn't one."""
+    if pos + 4 > len(data) or data[pos] != 0xFF or data[pos + 1] & 0xE0 != 0xE0:
+        return None
+    b1, b2, b3 = data[pos + 1], data[pos + 2], data[pos + 3]
+
+    version = {3: 1, 2: 2, 0: 2.5}.get((b1 >> 3) & 0x3)
+    layer = {3: 1, 2: 2, 1: 3}.get((b1 >> 1) & 0x3)
+    bitrate_index = b2 >> 4
+    rate_index = (b2 >> 2) & 0x3
+    if version is None or layer is None or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    bitrate = BITRATES[(1 if version == 1 else 2, layer)][bitrate_index] * 1000
+    sample_rate = SAMPLE_RATES[version][rate_index]
+    padding = (b2 >> 1) & 0x1
+
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    elif layer == 3 and version != 1:
+        samples = 576
+        length = 72 * bitrate // sample_rate + padding
+    else:
+        samples = 1152
+        length = 144 * bitrate // sample_rate + padding
+
+    return {
+        'version': version,
+        'layer': layer,
+        'bitrate': bitrate,
+        'sample_rate': sample_rate,
+        'channels': 1 if b3 >> 6 == 3 else 2,
+        'samples': samples,
+        'length': length,
+    }
+
+
+def find_first_frame(data: bytes) -> Optional[int]:
+    """Offset of the first frame header that is followed by a matching one."""
+    pos = data.find(b'\xff')
+    while 0 <= pos < len(data) - 4:
+        frame = parse_frame_header(data, pos)
+        if frame:
+            following = parse_frame_header(data, pos + frame['length'])
+            # Accept a lone frame only when the data runs out before the next one
+            if following is None and pos + frame['length'] + 4 > len(data):
+                return pos
+            if following and (following['version'], following['layer'], following['sample_rate']) \
+                    == (frame['version'], frame['layer'], frame['sample_rate']):
+                return pos
+        pos = data.find(b'\xff', pos + 1)
+    return None
+
+
+def parse_audio(data: bytes, audio_size: int) -> Optional[Dict]:
+    """Track metadata from the bytes at the start of the audio stream.
+
+    data begins right after any ID3v2 tag; audio_size is the length of the
+    audio (file size minus tags), used to time files without a VBR header.
+    """
+    pos = find_first_frame(data)
+    if pos is None:
+        return None
+    frame = parse_frame_header(data, pos)
+    sample_rate = frame['sample_rate']
+    frames = None
+    audio_bytes = audio_size - pos
+    delay = padding = 0
+
+    # Xing/Info sits after the side information; VBRI at a fixed offset
+    if frame['version'] == 1:
+        side_info = 17 if frame['channels'] == 1 else 32
+    else:
+        side_info = 9 if frame['channels'] == 1 else 17
+    xing = pos + 4 + side_info
+    vbri = pos + 4 + 32
+
+    if data[xing:xing + 4] in (b'Xing', b'Info'):
+        flags = int.from_bytes(data[xing + 4:xing + 8], 'big')
+        field = xing + 8
+        if flags & 0x1:
+            frames = int.from_bytes(data[field:field + 4], 'big')
+            field += 4
+        if flags & 0x2:
+            audio_bytes = int.from_bytes(data[field:field + 4], 'big') or audio_bytes
+            field += 4
+        if flags & 0x4:
+            field += 100
+        if flags & 0x8:
+            field += 4
+        # LAME extension: encoder delay and padding trim the decoded length
+        if data[field:field + 4] == b'LAME' and field + 24 <= len(data):
+            gap = int.from_bytes(data[field + 21:field + 24], 'big')
+            delay, padding = gap >> 12, gap & 0xFFF
+        if frames:
+            # The Xing frame itself carries no audio
+            audio_bytes -= frame['length']
+    elif data[vbri:vbri + 4] == b'VBRI':
+        audio_bytes = int.from_bytes(data[vbri + 10:vbri + 14], 'big') or audio_bytes
+        frames = int.from_bytes(data[vbri + 14:vbri + 18], 'big')
+
+    if frames:
+        samples = max(frames * frame['samples'] - delay - padding, 0)
+        duration = samples / sample_rate
+        bitrate = int(audio_bytes * 8 / duration) if duration else frame['bitrate']
+    else:
+        bitrate = frame['bitrate']
+        duration = audio_bytes * 8 / bitrate
+
+    return {
+        'duration': round(duration, 3),
+        'bitrate': bitrate,
+        'sample_rate': sample_rate,
+        'channels': frame['channels'],
+        'vbr': frames is not None and abs(bitrate - frame['bitrate']) > 1000,
+    }
+
+
+def scan_mp3(path: Path) -> Optional[Dict]:
+    """Read the headers of one MP3 file. Returns None if no audio frames are found."""
+    try:
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            start = id3v2_size(f.read(10))
+            f.seek(start)
+            data = f.read(SCAN_SIZE)
+            end = size
+            if size >= start + 128:
+                f.seek(size - 128)
+                if f.read(3) == b'TAG':
+                    end -= 128
+    except OSError:
+        return None
+    return parse_audio(data, end - start)
+
+
+def scan_stream(chunks: Iterable[bytes], size: int) -> Optional[Dict]:
+    """Like scan_mp3 for a file arriving as chunks; stops reading once the headers are in."""
+    data = b''
+    start = None
+    for chunk in chunks:
+        data += chunk
+        if start is None and len(data) >= 10:
+            start = id3v2_size(data)
+        if start is not None and len(data) >= start + SCAN_SIZE:
+            break
+    if start is None:
+        return None
+    return parse_audio(data[start:start + SCAN_SIZE], size - start)
+
+
+def scan_files(paths: Sequence[Path], workers: Optional[int] = None) -> Dict[Path, Optional[Dict]]:
+    """Scan many files across a process pool. Returns {path: metadata or None}."""
+    if len(paths) < 2:
+        return {path: scan_mp3(path) for path in paths}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(paths, pool.map(scan_mp3, paths, chunksize=64)))
@@ -0,0 +1,152 @@
+"""
+Playlist-weighted upload ordering for the Python ingest scripts.
+
+The channel/energy playlists exported by scripts/export-playlist-csvs.ts
+(playlist-exports/<channel>_<energy>.csv, with track_id and an optional
+weight column) are read into a compact index: one aggregate weight per
+track, summed over every playlist it appears in, and per playlist the
+tracks still missing from storage. Importers upload the heaviest tracks
+first, so the most played music is back soon after a full re-import, and
+the index reports when each playlist has every one of its tracks again.
+
+Files without a track_id column (e.g. slot strategy exports) are ignored.
+A track without a weight counts as 1, the weight of a playlist's top track.
+"""
+
+import csv
+import sys
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from ingest_metrics import format_seconds, metrics
+
+DEFAULT_PLAYLISTS = Path(__file__).resolve().parent.parent / "playlist-exports"
+DEFAULT_WEIGHT = 1.0
+ENERGY_LEVELS = ("low", "medium", "high")
+
+
+def playlist_label(name: str) -> str:
+    """'bach_beats_high' -> 'bach_beats (high)'."""
+    channel, _, energy = name.rpartition("_")
+    return f"{channel} ({energy})" if channel and energy in ENERGY_LEVELS else name
+
+
+class PlaylistIndex:
+    """Aggregate track weights and per-playlist availability. Thread-safe.
+
+    Tracks are numbered densely on load. Weights live in one float array and
+    each track's playlists in a flat offsets/members pair of arrays, so a
+    catalogue of thousands of tracks costs a few hundred KB.
+    """
+
+    def __init__(self, names: List[str], tracks: Dict[str, Dict[int, float]]):
+        self.names = names
+        self.started = time.monotonic()
+        self.ids: Dict[str, int] = {}
+        self.weights = array("d")
+        self.offsets = array("I", [0])
+        self.members = array("H")
+        self.remaining = array("I", [0] * len(names))
+        self.ready_at: Dict[int, float] = {}
+        self._available = bytearray(len(tracks))
+        self._lock = threading.Lock()
+
+        for track_id, playlists in tracks.items():
+            self.ids[track_id] = len(self.weights)
+            self.weights.append(sum(playlists.values()))
+            self.members.extend(sorted(playlists))
+            self.offsets.append(len(self.members))
+            for playlist in playlists:
+                self.remaining[playlist] += 1
+
+    @classmethod
+    def load(cls, directory: Path) -> "PlaylistIndex":
+        """Read every <name>.csv under directory that has a track_id column."""
+        names: List[str] = []
+        tracks: Dict[str, Dict[int, float]] = {}
+        for path in sorted(Path(directory).glob("*.csv")):
+            with open(path, newline="", encoding="utf-8") as f:
+                reader = csv.DictReader(f)
+                if "track_id" not in (reader.fieldnames or []):
+                    continue
+                playlist = len(names)
+                names.append(path.stem)
+                for row in reader:
+                    track_id = (row["track_id"] or "").strip()
+                    if not track_id:
+                        continue
+                    try:
+                        weight = float(row.get("weight") or DEFAULT_WEIGHT)
+                    except ValueError:
+                        weight = DEFAULT_WEIGHT
+                    # A track listed twice in one playlist keeps its heavier entry
+                    entries = tracks.setdefault(track_id, {})
+                    entries[playlist] = max(weight, entries.get(playlist, 0.0))
+        return cls(names, tracks)
+
+    def __len__(self) -> int:
+        return len(self.weights)
+
+    def weight(self, track_id: str) -> float:
+        """Aggregate playlist weight of a track (0 for tracks in no playlist)."""
+        index = self.ids.get(track_id)
+        return self.weights[index] if index is not None else 0.0
+
+    def available(self, track_id: str) -> List[str]:
+        """Mark a track as back in storage. Returns the playlists it completed."""
+        index = self.ids.get(track_id)
+        if index is None:
+            return []
+        completed = []
+        with self._lock:
+            if self._available[index]:
+                return []
+            self._available[index] = 1
+            for playlist in self.members[self.offsets[index]:self.offsets[index + 1]]:
+                self.remaining[playlist] -= 1
+                if self.remaining[playlist] == 0:
+                    self.ready_at[playlist] = time.monotonic() - self.started
+                    completed.append(playlist)
+        for playlist in completed:
+            name = self.names[playlist]
+            metrics.emit("playlist_ready", playlist=name, seconds=round(self.ready_at[playlist], 3))
+            print(f"  ▶ {playlist_label(name)} fully available after {format_seconds(self.ready_at[playlist])}",
+                  file=sys.stderr, flush=True)
+        return [self.names[playlist] for playlist in completed]
+
+    def summary(self) -> str:
+        total = sum(self.weights)
+        with self._lock:
+            available = sum(w for w, done in zip(self.weights, self._available) if done)
+        line = f"{len(self.ready_at)}/{len(self.names)} playlists fully available"
+        if total:
+            line += f", {available / total:.1%} of playlist weight"
+        return line
+
+    def report(self):
+        """Print when each playlist became fully available, then the ones still missing tracks."""
+        print(f"\nPlaylists: {self.summary()}")
+        for playlist, seconds in sorted(self.ready_at.items(), key=lambda item: item[1]):
+            print(f"  {playlist_label(self.names[playlist]):<32} ready after {format_seconds(seconds)}")
+        missing = [(self.remaining[p], self.names[p]) for p in range(len(self.names)) if self.remaining[p]]
+        for count, name in sorted(missing, reverse=True):
+            print(f"  {playlist_label(name):<32} {count} tracks not uploaded")
+
+
+def load_playlists(directory: Optional[str]) -> Optional[PlaylistIndex]:
+    """Load the index, or None (uploads keep discovery order) if there is nothing to read."""
+    if not directory:
+        return None
+    path = Path(directory)
+    if not path.is_dir():
+        print(f"No playlist exports at {path}; uploading in discovery order")
+        return None
+    index = PlaylistIndex.load(path)
+    if not len(index):
+        print(f"No track_id playlists in {path}; uploading in discovery order")
+        return None
+    print(f"Playlist order: {len(index)} tracks across {len(index.names)} playlists from {path}")
+    return index
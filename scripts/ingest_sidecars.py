@@ -0,0 +1,43 @@
+"""
+Packed sidecar manifest for the Python ingest scripts.
+
+Every sidecar the importer has matched to an MP3 and parsed is written
+as one line of a gzip-compressed NDJSON file, which is uploaded as a
+single object at the bucket root (sidecars.ndjson.gz). Consumers get the
+metadata of the whole catalogue with one GET instead of listing the
+bucket and fetching thousands of few-KB files, and the importer sends one
+request instead of one per sidecar. Each line is
+
+  {"path": "<sidecar storage path>", "track_id": "<file stem>", "sidecar": {...}}
+
+in path order. The gzip header carries no name or timestamp, so an
+unchanged catalogue packs to the same bytes, and the same MD5, every time.
+"""
+
+import gzip
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Tuple
+
+PACK_PATH = "sidecars.ndjson.gz"
+PACK_CONTENT_TYPE = "application/gzip"
+PACK_COMPRESSION = 6
+
+
+def pack_sidecars(sidecars: Iterable[Tuple[str, Dict]], output_path: str) -> int:
+    """Write (sidecar storage path, parsed sidecar) pairs into the pack at output_path.
+
+    The sidecars are the ones already read and parsed for the import, so no
+    file is opened again here. Returns the number of sidecars packed.
+    """
+    packed = 0
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, "wb") as raw, \
+            gzip.GzipFile(filename="", mode="wb", fileobj=raw, compresslevel=PACK_COMPRESSION, mtime=0) as f:
+        for path, sidecar in sorted(sidecars, key=lambda item: item[0]):
+            line = {"path": path, "track_id": Path(path).stem, "sidecar": sidecar}
+            f.write(json.dumps(line, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n")
+            packed += 1
+    os.replace(tmp_path, output_path)
+    return packed
@@ -0,0 +1,202 @@
+"""
+Upload checksums and post-upload verification for the Python ingest scripts.
+
+Uploads stream through HashingReader, which computes MD5 and SHA-256 from
+the same reads that feed the request body, so a file is never read twice
+to be checksummed. Once a run's uploads are done, verify_uploads() lists
+every folder it wrote to (in parallel, one paged list request per 1000
+objects rather than one HEAD per file) and compares each object's size
+and ETag with what was sent. Storage reports a plain upload's ETag as the
+MD5 of its content; multipart uploads get a composite "<md5>-<parts>" ETag,
+which only the size can be checked against.
+"""
+
+import hashlib
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from ingest_client import BUCKET_NAME, IngestClient
+from ingest_metrics import metrics
+
+LIST_PAGE_SIZE = 1000
+LIST_WORKERS = 8
+VERIFY_ROUNDS = 2  # re-upload and re-check mismatches this many times
+
+
+class HashingReader:
+    """Read-only file wrapper that hashes the bytes as they are sent.
+
+    The HTTP client streams the body straight from the file descriptor, so
+    no upload holds more than one read block in memory. Seeking back to the
+    start (a retried request) restarts the digests.
+    """
+
+    mode = "rb"
+
+    def __init__(self, f):
+        self._f = f
+        self._start = f.tell()
+        self.md5 = hashlib.md5()
+        self.sha256 = hashlib.sha256()
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._f.read(size)
+        self.md5.update(data)
+        self.sha256.update(data)
+        return data
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        position = self._f.seek(offset, whence)
+        if position != self._start:
+            raise ValueError("HashingReader can only rewind to its start")
+        self.md5 = hashlib.md5()
+        self.sha256 = hashlib.sha256()
+        return position
+
+    def tell(self) -> int:
+        return self._f.tell()
+
+    def fileno(self) -> int:
+        return self._f.fileno()
+
+
+def list_page(client: IngestClient, prefix: str = "", offset: int = 0,
+              limit: int = LIST_PAGE_SIZE) -> List[Dict]:
+    """Send one object/list request and return the raw entries for that page."""
+    # Sorting by name keeps offsets stable from one page to the next
+    params = {
+        "limit": limit,
+        "offset": offset,
+        "prefix": prefix,
+        "sortBy": {"column": "name", "order": "asc"}
+    }
+
+    response = client.request("POST", f"/storage/v1/object/list/{BUCKET_NAME}", json=params, timeout=60)
+    response.raise_for_status()
+    return response.json()
+
+
+def iter_objects(client: IngestClient, prefix: str = "", workers: int = LIST_WORKERS,
+                 recursive: bool = True) -> Iterator[Tuple[str, Dict]]:
+    """Yield (full object path, storage metadata) for everything under prefix.
+
+    Each folder is paged with offset until a short page comes back, and pages
+    from different folders are fetched concurrently. Entries are yielded as
+    soon as their page arrives, so callers can start working before the
+    listing is complete. A page that still fails after retries raises.
+    Without recursive, only the objects directly in prefix are listed.
+    """
+    # Entries shifting between pages can repeat a folder placeholder
+    seen_folders = {prefix}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {pool.submit(list_page, client, prefix, 0): (prefix, 0)}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                folder, offset = pending.pop(future)
+                items = future.result()
+                if len(items) == LIST_PAGE_SIZE:
+                    next_offset = offset + LIST_PAGE_SIZE
+                    pending[pool.submit(list_page, client, folder, next_offset)] = (folder, next_offset)
+                for item in items:
+                    name = item.get('name')
+                    if not name:
+                        continue
+                    path = f"{folder}/{name}".strip("/")
+                    if item.get('id') is None:
+                        # Folders come back as placeholder entries without an id
+                        if recursive and path not in seen_folders:
+                            seen_folders.add(path)
+                            pending[pool.submit(list_page, client, path, 0)] = (path, 0)
+                    else:
+                        yield path, item.get('metadata') or {}
+
+
+def remote_matches(local: Dict, remote: Dict) -> bool:
+    """Compare a local entry (size, md5) with remote metadata by size and, when usable, ETag."""
+    if remote.get('size') != local['size']:
+        return False
+    etag = (remote.get('eTag') or '').strip('"')
+    # Multipart uploads get a composite "<md5>-<parts>" ETag, which only size can check
+    if local.get('md5') and len(etag) == 32 and '-' not in etag:
+        return etag == local['md5']
+    return True
+
+
+def check_uploads(client: IngestClient, expected: Dict[str, Dict],
+                  workers: int = LIST_WORKERS) -> Dict[str, str]:
+    """Compare storage with expected (storage path -> size, md5).
+
+    Returns {path: problem} for objects that are missing or do not match.
+    """
+    folders: Dict[str, List[str]] = {}
+    for path in expected:
+        folders.setdefault(os.path.dirname(path), []).append(path)
+
+    remote: Dict[str, Dict] = {}
+    problems: Dict[str, str] = {}
+
+    def list_folder(folder: str):
+        return list(iter_objects(client, folder, workers=1, recursive=False))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(list_folder, folder): folder for folder in folders}
+        for future in futures:
+            try:
+                remote.update(future.result())
+            except Exception as e:
+                for path in folders[futures[future]]:
+                    problems[path] = f"listing failed ({e})"
+
+    for path, local in expected.items():
+        if path in problems:
+            continue
+        meta = remote.get(path)
+        if meta is None:
+            problems[path] = "missing from storage"
+        elif not remote_matches(local, meta):
+            etag = (meta.get('eTag') or '').strip('"')
+            problems[path] = f"storage has {meta.get('size')} bytes, ETag {etag or '-'}; " \
+                             f"sent {local['size']} bytes, MD5 {local.get('md5') or '-'}"
+        metrics.file_done(path, local['size'], path not in problems, error=problems.get(path))
+    return problems
+
+
+def verify_uploads(client: IngestClient, expected: Dict[str, Dict],
+                   reupload: Callable[[str], Optional[Dict]],
+                   rounds: int = VERIFY_ROUNDS) -> Dict[str, str]:
+    """Check every expected object and re-upload the ones that do not match.
+
+    reupload(path) sends the local file again (overwriting the object) and
+    returns its new entry (size, md5), or None if the upload failed. Repaired
+    objects are checked again, up to rounds times. Returns {path: problem}
+    for the objects still wrong at the end.
+    """
+    print(f"Verifying {len(expected)} objects against storage...")
+    with metrics.phase('verify', files=len(expected), size=sum(e['size'] for e in expected.values())):
+        problems = check_uploads(client, expected)
+
+    for attempt in range(1, rounds + 1):
+        if not problems:
+            break
+        print(f"{len(problems)} objects do not match; re-uploading (round {attempt}/{rounds})")
+        for path, problem in sorted(problems.items()):
+            print(f"  - {path}: {problem}")
+        retry = {}
+        with metrics.phase('reupload', files=len(problems)):
+            for path in sorted(problems):
+                entry = reupload(path)
+                if entry is not None:
+                    expected[path] = entry
+                retry[path] = expected[path]
+        with metrics.phase('verify', files=len(retry)):
+            problems = check_uploads(client, retry)
+
+    if problems:
+        print(f"{len(problems)} objects still do not match storage:")
+        for path, problem in sorted(problems.items()):
+            print(f"  - {path}: {problem}")
+    else:
+        print(f"Verified: all {len(expected)} objects match")
+    return problems
@@ -0,0 +1,153 @@
+"""
+Streaming directory discovery for the Python ingest scripts.
+
+Each directory is read with os.scandir as its own task on a small thread
+pool, so the folders of a network-mounted library are listed in parallel.
+Matching files are handed over through a bounded queue as soon as they are
+seen, together with the stat result taken during the walk, so uploads start
+before the scan finishes and nothing is stat'ed twice. The running totals
+let callers refine their progress and ETA while discovery continues.
+"""
+
+import heapq
+import itertools
+import os
+import queue
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Iterator, List, Tuple
+
+WALK_WORKERS = 8
+QUEUE_SIZE = 1024  # discovered files waiting for the consumer
+
+_DONE = object()
+
+
+class FileDiscovery:
+    """Walk root in the background, yielding (path, stat) for files ending in suffix.
+
+    Use as a context manager and iterate it:
+
+        with FileDiscovery(root, ".mp3") as discovery:
+            for path, stat in discovery:
+                ...  # discovery.files / discovery.bytes / discovery.done so far
+    """
+
+    def __init__(self, root: Path, suffix: str, workers: int = WALK_WORKERS):
+        self.root = Path(root)
+        self.suffix = suffix
+        self.workers = workers
+        self.files = 0
+        self.bytes = 0
+        self.done = False
+        self.errors: List[str] = []
+        self._lock = threading.Lock()
+        self._queue: queue.Queue = queue.Queue(QUEUE_SIZE)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._walk, daemon=True)
+
+    def __enter__(self) -> "FileDiscovery":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __iter__(self) -> Iterator[Tuple[Path, os.stat_result]]:
+        while True:
+            item = self._queue.get()
+            if item is _DONE:
+                return
+            yield item
+
+    def prioritized(self, key: Callable[[Path], float]) -> Iterator[Tuple[Path, os.stat_result]]:
+        """Iterate highest key(path) first among the files found so far.
+
+        Before each file is handed out, everything the walk has queued since
+        is pulled in, so once the (fast, local) walk is ahead of the consumer
+        the whole library is ordered; ties keep discovery order.
+        """
+        heap: List[Tuple[float, int, Path, os.stat_result]] = []
+        order = itertools.count()
+        walking = True
+        while walking or heap:
+            while walking:
+                try:
+                    # Wait only when there is nothing to hand out yet
+                    item = self._queue.get(block=not heap)
+                except queue.Empty:
+                    break
+                if item is _DONE:
+                    walking = False
+                else:
+                    path, stat = item
+                    heapq.heappush(heap, (-key(path), next(order), path, stat))
+            if heap:
+                _, _, path, stat = heapq.heappop(heap)
+                yield path, stat
+
+    def total(self) -> str:
+        """Files found so far, marked with + while the walk is still running."""
+        return f"{self.files}" if self.done else f"{self.files}+"
+
+    def close(self):
+        """Stop the walk (if the consumer gave up early) and wait for it to exit."""
+        self._stop.set()
+        while self._thread.is_alive():
+            try:
+                self._queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+    def _walk(self):
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                pending = {pool.submit(self._scan, self.root)}
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        for directory in future.result():
+                            pending.add(pool.submit(self._scan, directory))
+        finally:
+            self.done = True
+            self._put(_DONE)
+
+    def _scan(self, directory) -> List[str]:
+        """List one directory, queueing matching files. Returns its subdirectories."""
+        subdirectories = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if self._stop.is_set():
+                        return []
+                    try:
+                        # Like Path.rglob, don't descend into symlinked directories
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirectories.append(entry.path)
+                        elif entry.name.endswith(self.suffix) and entry.is_file():
+                            stat = entry.stat()
+                            with self._lock:
+                                self.files += 1
+                                self.bytes += stat.st_size
+                            self._put((Path(entry.path), stat))
+                    except OSError as e:
+                        self.errors.append(f"{entry.path}: {e}")
+        except OSError as e:
+            self.errors.append(f"{directory}: {e}")
+        return subdirectories
+
+    def _put(self, item):
+        # Block while the consumer is behind, but give up once it has stopped reading
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+
+def walk_files(root: Path, suffix: str, workers: int = WALK_WORKERS) -> Iterator[Tuple[Path, os.stat_result]]:
+    """Yield (path, stat) for every file under root ending in suffix, as it is found."""
+    with FileDiscovery(root, suffix, workers) as discovery:
+        yield from discovery
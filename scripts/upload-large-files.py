@@ -1,17 +1,19 @@
 #!/usr/bin/env python3
 import os
 import sys
-import requests
+import time
 from pathlib import Path
-from dotenv import load_dotenv
 
-load_dotenv()
+from ingest_client import ANON_KEY, BUCKET_NAME, IngestClient, require_config
+from ingest_db import AudioTrackWriter
+from ingest_metrics import metrics
+from ingest_mp3 import scan_files
+
+client = IngestClient(require_config(ANON_KEY, "VITE_SUPABASE_ANON_KEY"))
 
-SUPABASE_URL = os.getenv('VITE_SUPABASE_URL')
-SUPABASE_KEY = os.getenv('VITE_SUPABASE_ANON_KEY')
 CHANNEL_ID = 'f76d55c8-3ac0-4d0b-8331-6968ada11896'
 
-def upload_file(file_path, filename):
+def upload_file(file_path, filename, writer, info=None):
     """Upload a single file to Supabase storage using multipart upload"""
 
     storage_path = f"audio-tracks/{filename}"
@@ -21,11 +23,9 @@ def upload_file(file_path, filename):
     print(f"  File size: {file_size / (1024*1024):.1f} MB")
 
     # Upload to storage
-    url = f"{SUPABASE_URL}/storage/v1/object/audio-files/{storage_path}"
+    path = f"/storage/v1/object/{BUCKET_NAME}/{storage_path}"
 
     headers = {
-        'apikey': SUPABASE_KEY,
-        'Authorization': f'Bearer {SUPABASE_KEY}',
         'x-upsert': 'true'
     }
 
@@ -35,34 +35,19 @@ def upload_file(file_path, filename):
         files = {'file': (filename, f, 'audio/mpeg')}
 
         try:
-            response = requests.post(url, headers=headers, files=files, timeout=300)
+            response = client.request('POST', path, headers=headers, files=files, timeout=300)
 
             if response.status_code in [200, 201]:
                 print(f"  ✓ Uploaded to storage")
 
-                # Insert database record
-                db_url = f"{SUPABASE_URL}/rest/v1/audio_tracks"
-                db_headers = {
-                    'apikey': SUPABASE_KEY,
-                    'Authorization': f'Bearer {SUPABASE_KEY}',
-                    'Content-Type': 'application/json',
-                    'Prefer': 'resolution=ignore-duplicates'
-                }
-
-                db_data = {
+                # Queue database record; rows are upserted in batches
+                writer.add({
                     'channel_id': CHANNEL_ID,
                     'energy_level': 'medium',
                     'file_path': storage_path,
-                    'duration_seconds': 180,
-                    'metadata': {'source': 'google_drive_import'}
-                }
-
-                db_response = requests.post(db_url, headers=db_headers, json=db_data, timeout=30)
-
-                if db_response.status_code in [200, 201]:
-                    print(f"  ✓ Database record created")
-                else:
-                    print(f"  ⚠ Database record may already exist")
+                    'duration_seconds': round(info['duration']) if info else 0,
+                    'metadata': {'source': 'google_drive_import', **(info or {})}
+                })
 
                 return True
             else:
@@ -78,6 +63,14 @@ def main():
     mp3_files = sorted(files_dir.glob('*.mp3'))
 
     total = len(mp3_files)
+
+    # Read duration/bitrate from the MP3 headers up front, across all cores
+    with metrics.phase('scan'), metrics.timer('scan'):
+        metadata = scan_files(mp3_files)
+    unreadable = [path.name for path, info in metadata.items() if info is None]
+    if unreadable:
+        print(f"⚠ No MP3 frame headers found in {len(unreadable)} files; their duration is left at 0")
+
     print(f"\n{'='*60}")
     print(f"Uploading {total} files to Supabase")
     print(f"{'='*60}\n")
@@ -85,21 +78,32 @@ def main():
     success_count = 0
     fail_count = 0
 
-    for i, file_path in enumerate(mp3_files, 1):
-        filename = file_path.name
-        print(f"[{i}/{total}] {filename}")
+    sizes = {file_path: file_path.stat().st_size for file_path in mp3_files}
 
-        if upload_file(file_path, filename):
-            success_count += 1
-        else:
-            fail_count += 1
+    with AudioTrackWriter(client) as writer:
+        with metrics.phase('upload', files=total, size=sum(sizes.values())):
+            for i, file_path in enumerate(mp3_files, 1):
+                filename = file_path.name
+                print(f"[{i}/{total}] {filename}")
+
+                started = time.monotonic()
+                ok = upload_file(file_path, filename, writer, metadata[file_path])
+                metrics.file_done(file_path, sizes[file_path], ok, time.monotonic() - started)
+                if ok:
+                    success_count += 1
+                else:
+                    fail_count += 1
 
-        print()
+                print()
+        with metrics.phase('db-write'):
+            writer.flush()
 
     print(f"{'='*60}")
     print(f"Upload Complete!")
     print(f"Success: {success_count} files")
     print(f"Failed: {fail_count} files")
+    writer.report()
+    metrics.report()
     print(f"{'='*60}\n")
 
 if __name__ == '__main__':
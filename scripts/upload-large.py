@@ -1,13 +1,50 @@
 #!/usr/bin/env python3
 
+import argparse
+import json
 import os
+import queue
 import sys
-import requests
+import tempfile
+import threading
+import time
+from base64 import b64encode
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from functools import lru_cache
 from pathlib import Path
 
-SUPABASE_URL = os.getenv('VITE_SUPABASE_URL')
-SUPABASE_KEY = os.getenv('VITE_SUPABASE_ANON_KEY')
+from ingest_client import ANON_KEY, BUCKET_NAME, IngestClient, RequestError, require_config
+from ingest_db import AudioTrackWriter
+from ingest_metrics import metrics
+from ingest_mp3 import SCAN_SIZE, id3v2_size, scan_stream
+
+client = IngestClient(require_config(ANON_KEY, "VITE_SUPABASE_ANON_KEY"))
 CHANNEL_ID = 'f76d55c8-3ac0-4d0b-8331-6968ada11896'
+# Overridable so the ingest benchmark can serve the files locally
+DRIVE_URL = os.getenv('DRIVE_DOWNLOAD_URL', 'https://drive.google.com/uc?export=download')
+
+CHUNK_SIZE = 6 * 1024 * 1024  # Starting TUS chunk size
+CHUNK_MIN = 5 * 1024 * 1024   # Smallest part Supabase's S3 backend accepts for all but the last
+CHUNK_MAX = 32 * 1024 * 1024
+CHUNK_BUFFER_BUDGET = 64 * 1024 * 1024  # Per upload; caps CHUNK_MAX so its buffered chunks fit
+CHUNK_RANGE = 2               # The budget never caps the largest chunk below this many times the smallest
+CHUNK_MAX_SECONDS = 30.0      # Keep a PATCH well inside the request timeout
+CHUNK_LOSS_DECAY = 0.95       # Per-PATCH decay of the failure history
+READ_SIZE = 256 * 1024        # Download read size
+PIPE_DEPTH = 2                # Chunks buffered between download and upload
+# Chunks a pipeline can hold at once: the pipe, the lookahead, the one sending,
+# and in rechunk the pieces being gathered plus the chunk joined from them
+PIPE_CHUNKS = PIPE_DEPTH + 4
+
+TUS_STATE_FILE = 'upload-large.tus-state.json'  # Upload URLs of unfinished uploads
+TUS_RETRIES = 5
+TUS_BACKOFF = 1.0
+TUS_BACKOFF_MAX = 30.0
+
+CACHE_DIR = 'upload-large.cache'  # Finished Drive downloads, kept for later runs
+CACHE_MAX_GB = 20.0
+CACHE_INDEX = 'index.json'
 
 FILE_IDS = [
     '11BeIiodomJUczrlaVY5LPAPXtg7_Nv6z', '15TA54CnsN_svXgWUe55rAAIlJSdN5iwa',
@@ -32,127 +69,809 @@ FILE_IDS = [
     '1z7mmoIbNEGxsOdP_AZlcUcRANHTMShwA'
 ]
 
-def download_file(file_id):
-    """Download file from Google Drive"""
-    url = f'https://drive.google.com/uc?export=download&id={file_id}'
-    response = requests.get(url, stream=True)
+@lru_cache(maxsize=None)
+def drive_head(file_id):
+    """Drive's (size, ETag) for a file from a HEAD request; each is None if Drive won't say.
+
+    Asked once per file and run; the size orders the uploads and both
+    validate the cached copy.
+    """
+    url = f'{DRIVE_URL}&id={file_id}'
+    try:
+        response = client.request('HEAD', url, timeout=30)
+    except RequestError:
+        return None, None
+    if response.status_code != 200:
+        return None, None
+    length = response.headers.get('Content-Length')
+    return (int(length) if length else None), response.headers.get('ETag')
+
+class CacheWriter:
+    """Tees one Drive download into a temporary file in the cache."""
+
+    def __init__(self, cache, file_id, size, etag):
+        self.cache = cache
+        self.file_id = file_id
+        self.size = size
+        self.etag = etag
+        self.written = 0
+        fd, path = tempfile.mkstemp(prefix=f'{file_id}.', suffix='.part', dir=cache.directory)
+        self.path = Path(path)
+        self._f = os.fdopen(fd, 'wb')
+
+    def write(self, piece):
+        self._f.write(piece)
+        self.written += len(piece)
+
+    def close(self, complete):
+        """Store the file if the download completed, otherwise throw it away."""
+        self._f.close()
+        self.cache._finish(self, complete)
+
+class DriveCache:
+    """Size-capped on-disk cache of Drive downloads, keyed by file ID.
+
+    A file is stored once a download that started from its first byte runs
+    to the end, together with its size and ETag. The first time a run uses
+    an entry, the entry is checked against a HEAD to Drive and dropped if
+    Drive reports a different size or ETag (a file Drive says neither about
+    is trusted). Before a new file is stored, the least recently used
+    entries are deleted until it fits under max_bytes. The index lives in
+    the cache directory and is rewritten on every change, like the TUS
+    state file.
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=int(CACHE_MAX_GB * 1024 ** 3)):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.hits = set()
+        self.stored = set()
+        self.read_bytes = 0
+        self.evicted = 0
+        self._checked = set()
+        self._reserved = 0
+        self._lock = threading.Lock()
+        self._entries = {}
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        index_path = self.directory / CACHE_INDEX
+        if index_path.exists():
+            with open(index_path) as f:
+                self._entries = json.load(f)
+        # Downloads cut short by an earlier run
+        for path in self.directory.glob('*.part'):
+            path.unlink()
+        for file_id, entry in list(self._entries.items()):
+            path = self.directory / file_id
+            if not path.is_file() or path.stat().st_size != entry['size']:
+                del self._entries[file_id]
+        with self._lock:
+            self._make_room(0)
+            self._save()
+
+    def _save(self):
+        index_path = self.directory / CACHE_INDEX
+        tmp_path = index_path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self._entries, f, indent=2)
+        os.replace(tmp_path, index_path)
+
+    def _used(self):
+        return sum(entry['size'] for entry in self._entries.values())
+
+    def _remove(self, file_id):
+        self._entries.pop(file_id, None)
+        self._checked.discard(file_id)
+        try:
+            (self.directory / file_id).unlink()
+        except FileNotFoundError:
+            pass
+
+    def _make_room(self, size):
+        """Evict least recently used entries until size more bytes fit. Needs the lock."""
+        for file_id in sorted(self._entries, key=lambda key: self._entries[key]['used']):
+            if self._used() + self._reserved + size <= self.max_bytes:
+                break
+            self._remove(file_id)
+            self.evicted += 1
+
+    def lookup(self, file_id, offset=0):
+        """Open the cached copy of file_id for reading from offset, or return None if there is no valid one."""
+        with self._lock:
+            entry = self._entries.get(file_id)
+            checked = file_id in self._checked
+        if entry is None:
+            return None
+
+        if not checked:
+            size, etag = drive_head(file_id)
+            if (size is not None and size != entry['size']) or (etag and entry['etag'] and etag != entry['etag']):
+                print(f'  Cached copy of {file_id} no longer matches Drive; downloading it again')
+                with self._lock:
+                    self._remove(file_id)
+                    self._save()
+                return None
+
+        with self._lock:
+            # Another download may have evicted it in the meantime
+            entry = self._entries.get(file_id)
+            if entry is None:
+                return None
+            self._checked.add(file_id)
+            entry['used'] = time.time()
+            self._save()
+            f = open(self.directory / file_id, 'rb')
+            self.hits.add(file_id)
+            self.read_bytes += entry['size'] - offset
+        f.seek(offset)
+        return f
+
+    def writer(self, file_id, size, etag):
+        """A CacheWriter for a download of the whole of file_id, or None if it can never fit."""
+        with self._lock:
+            if size is not None and size > self.max_bytes:
+                return None
+            # Room for a download of known size is made up front, so the files
+            # being written never take the directory over the cap either
+            self._make_room(size or 0)
+            self._reserved += size or 0
+        return CacheWriter(self, file_id, size, etag)
+
+    def _finish(self, writer, complete):
+        stored = False
+        with self._lock:
+            self._reserved -= writer.size or 0
+            if complete and writer.size in (None, writer.written) and writer.written <= self.max_bytes:
+                self._entries.pop(writer.file_id, None)
+                self._make_room(writer.written)
+                os.replace(writer.path, self.directory / writer.file_id)
+                self._entries[writer.file_id] = {'size': writer.written, 'etag': writer.etag, 'used': time.time()}
+                self._checked.add(writer.file_id)
+                self.stored.add(writer.file_id)
+                self._save()
+                stored = True
+        if not stored:
+            writer.path.unlink()
+
+    def summary(self):
+        with self._lock:
+            used = self._used()
+        line = f'{len(self.hits)} files read from cache ({self.read_bytes / 1024 / 1024:.1f} MB), ' \
+               f'{len(self.stored)} downloaded and stored'
+        if self.evicted:
+            line += f', {self.evicted} evicted'
+        return line + f'; {used / 1024 ** 3:.2f} of {self.max_bytes / 1024 ** 3:.2f} GB used'
+
+def rechunk(pieces, sizer=None):
+    """Regroup pieces into chunks of CHUNK_SIZE, or whatever the ChunkSizer currently asks for.
+
+    Pieces are gathered as memoryviews and joined once per chunk, so each
+    chunk is copied only once.
+    """
+    with closing(pieces):
+        parts = []
+        held = 0
+        for piece in pieces:
+            piece = memoryview(piece)
+            while piece:
+                chunk_size = sizer.size if sizer else CHUNK_SIZE
+                take = max(0, min(len(piece), chunk_size - held))
+                if take:
+                    parts.append(piece[:take])
+                    piece = piece[take:]
+                    held += take
+                if held >= chunk_size:
+                    chunk = b''.join(parts)
+                    parts, held = [], 0
+                    yield chunk
+                    del chunk
+        if parts:
+            yield b''.join(parts)
+
+def file_pieces(f):
+    with f:
+        yield from iter(lambda: f.read(READ_SIZE), b'')
+
+def drive_pieces(response, skip, store=None):
+    """Read a Drive response, dropping its first skip bytes.
+
+    store() returns a CacheWriter (or None) for the whole body, which then
+    keeps the file only if the response is read to the end.
+    """
+    with response:
+        writer = store() if store else None
+        complete = False
+        try:
+            for piece in response.iter_bytes(READ_SIZE):
+                if writer:
+                    writer.write(piece)
+                if skip:
+                    dropped = min(skip, len(piece))
+                    piece = piece[dropped:]
+                    skip -= dropped
+                if piece:
+                    yield piece
+            complete = True
+        finally:
+            if writer:
+                writer.close(complete)
+
+def download_file(file_id, offset=0, sizer=None, cache=None, fill_cache=True):
+    """Stream a file from Google Drive (or the cache), starting at byte offset.
+
+    Returns (total size in bytes or None if Drive did not send one, iterator
+    of chunks from offset onwards). Chunks are CHUNK_SIZE, or whatever the
+    ChunkSizer currently asks for. Nothing beyond the current chunk is held
+    in memory. A download that receives the whole file is added to the cache,
+    unless fill_cache is False (a caller reading only the start of the file).
+    """
+    cached = cache.lookup(file_id, offset) if cache else None
+    if cached:
+        return os.fstat(cached.fileno()).st_size, rechunk(file_pieces(cached), sizer)
+
+    url = f'{DRIVE_URL}&id={file_id}'
+    headers = {'Range': f'bytes={offset}-'} if offset else {}
+    response = client.open_stream('GET', url, headers=headers)
     response.raise_for_status()
-    return response.content
-
-def upload_to_supabase_chunked(file_data, file_name):
-    """Upload file to Supabase using chunked upload"""
-    storage_path = f'audio-tracks/{file_name}'
-
-    # Use TUS protocol endpoint for resumable uploads
-    tus_url = f'{SUPABASE_URL}/storage/v1/upload/resumable'
-
-    headers = {
-        'Authorization': f'Bearer {SUPABASE_KEY}',
-        'apikey': SUPABASE_KEY,
-        'Tus-Resumable': '1.0.0',
-        'Upload-Length': str(len(file_data)),
-        'Upload-Metadata': f'bucketName YXVkaW8tZmlsZXM=,objectName {Path("audio-tracks").joinpath(file_name).as_posix()}',
-        'Content-Type': 'application/offset+octet-stream'
-    }
-
-    # Create upload
-    create_response = requests.post(tus_url, headers=headers)
 
-    if create_response.status_code not in [200, 201]:
-        raise Exception(f'Failed to create upload: {create_response.status_code} - {create_response.text}')
-
-    upload_url = create_response.headers.get('Location')
-
-    # Upload file in chunks
-    chunk_size = 6 * 1024 * 1024  # 6MB chunks
-    offset = 0
-
-    while offset < len(file_data):
-        chunk = file_data[offset:offset + chunk_size]
-
-        patch_headers = {
-            'Authorization': f'Bearer {SUPABASE_KEY}',
-            'apikey': SUPABASE_KEY,
-            'Tus-Resumable': '1.0.0',
-            'Upload-Offset': str(offset),
-            'Content-Type': 'application/offset+octet-stream',
-            'Content-Length': str(len(chunk))
+    skip = 0
+    store = None
+    if offset and response.status_code == 206:
+        total = response.headers.get('Content-Range', '').rpartition('/')[2]
+        size = int(total) if total.isdigit() else None
+    else:
+        length = response.headers.get('Content-Length')
+        size = int(length) if length and 'Content-Encoding' not in response.headers else None
+        # Range was ignored, so throw away the part the server already has
+        skip = offset
+        if cache and fill_cache:
+            etag = response.headers.get('ETag')
+            store = lambda: cache.writer(file_id, size, etag)
+
+    return size, rechunk(drive_pieces(response, skip, store), sizer)
+
+class SlotStream:
+    """Chunk iterator that owns an already acquired semaphore slot.
+
+    The slot is released exactly once, when the chunks run out or close() is
+    called, whichever comes first, even if closing the chunks fails. close()
+    must not be called while another thread is iterating (see prefetch).
+    """
+
+    def __init__(self, chunks, semaphore):
+        self.chunks = chunks
+        self.semaphore = semaphore
+        self._released = False
+        self._lock = threading.Lock()
+
+    def __iter__(self):
+        try:
+            yield from self.chunks
+        finally:
+            self.close()
+
+    def close(self):
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        try:
+            self.chunks.close()
+        finally:
+            self.semaphore.release()
+
+class TokenBucket:
+    """Blocks callers so that on average no more than rate bytes/s go through."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(rate, CHUNK_SIZE)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, amount):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Go into debt and sleep it off, so concurrent callers queue fairly
+            self.tokens -= amount
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0
+        if delay:
+            time.sleep(delay)
+
+class ChunkSizer:
+    """Chooses the TUS chunk size from measured throughput, overhead and loss.
+
+    A chunk of S bytes costs about c + S/B seconds (c: per-request overhead,
+    timed on the body-less TUS requests; B: per-upload throughput), and a
+    failure part-way wastes the whole chunk. With failures arriving at rate
+    L per byte sent, the time per delivered byte is smallest at
+
+        S = (sqrt((L*c*B)**2 + 4*L*c*B) - L*c*B) / (2*L)
+
+    so fast links with a high overhead get large chunks and lossy ones small
+    chunks. Without failures the size doubles after each successful chunk,
+    and it never exceeds what the link moves in CHUNK_MAX_SECONDS. Sizes
+    stay within [minimum, maximum] in READ_SIZE steps; a fixed sizer keeps
+    its size. Shared by all uploads, since they share the link.
+    """
+
+    def __init__(self, size=CHUNK_SIZE, minimum=CHUNK_MIN, maximum=CHUNK_MAX, fixed=False):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.fixed = fixed
+        self.size = size if fixed else self._clamp(size)
+        self.overhead = 0.0       # seconds, moving average
+        self.throughput = None    # bytes/s, moving average over successful chunks
+        self._sent = 0.0          # bytes attempted and failures, both decaying,
+        self._failures = 0.0      # so the loss estimate follows the link
+        self._lock = threading.Lock()
+
+    def _clamp(self, size):
+        return max(self.minimum, min(self.maximum, int(size) // READ_SIZE * READ_SIZE))
+
+    def _optimum(self):
+        limit = self.throughput * CHUNK_MAX_SECONDS
+        if not self._failures:
+            return limit
+        loss = self._failures / self._sent
+        cost = loss * self.overhead * self.throughput
+        return min(limit, ((cost * cost + 4 * cost) ** 0.5 - cost) / (2 * loss))
+
+    def request_time(self, seconds):
+        """Record the duration of a request without a body (the fixed cost of a PATCH)."""
+        with self._lock:
+            self.overhead = seconds if not self.overhead else 0.8 * self.overhead + 0.2 * seconds
+
+    def success(self, sent, seconds):
+        with self._lock:
+            self._record(sent, failed=False)
+            transfer = max(seconds - self.overhead, seconds / 10, 1e-3)
+            rate = sent / transfer
+            self.throughput = rate if self.throughput is None else 0.7 * self.throughput + 0.3 * rate
+            if not self.fixed:
+                self.size = self._clamp(min(self.size * 2, self._optimum()))
+
+    def failure(self, sent):
+        with self._lock:
+            self._record(sent, failed=True)
+            if not self.fixed and self.throughput:
+                self.size = self._clamp(min(self.size, self._optimum()))
+
+    def _record(self, sent, failed):
+        self._sent = CHUNK_LOSS_DECAY * self._sent + sent
+        self._failures = CHUNK_LOSS_DECAY * self._failures + (1 if failed else 0)
+        if self._failures < 0.01:
+            self._failures = 0.0
+
+class TransferLimits:
+    """Global limits shared by every file pipeline."""
+
+    def __init__(self, max_downloads=1, max_uploads=1, bandwidth=None):
+        self.downloads = threading.BoundedSemaphore(max_downloads)
+        self.uploads = threading.BoundedSemaphore(max_uploads)
+        self.bandwidth = TokenBucket(bandwidth) if bandwidth else None
+
+def prefetch(chunks, depth=PIPE_DEPTH):
+    """Pull chunks on a background thread, buffering at most depth of them.
+
+    Lets the download run ahead of the upload without ever holding more than
+    a few chunks. Errors from the producer are re-raised in the consumer.
+    Closing the returned generator stops the producer and waits for it, so
+    chunks is no longer running once close() returns.
+    """
+    pipe = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                pipe.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for chunk in chunks:
+                if not put(chunk):
+                    return
+            put(done)
+        except BaseException as e:
+            put(e)
+        finally:
+            # Closes the download (and frees its slot) even if abandoned early
+            close = getattr(chunks, 'close', None)
+            if close:
+                close()
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = pipe.get()
+            if item is done:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        producer.join()
+
+class TusClient:
+    """Resumable TUS 1.0 uploads to Supabase storage.
+
+    The upload URL for each object is kept in a JSON state file until the
+    upload finishes, so a later run can HEAD it for the server's
+    Upload-Offset and continue from there. A failed PATCH is retried with
+    backoff from the offset the server reports, so a dropped connection
+    costs at most the rest of one chunk. Chunk sizes adapt through the
+    ChunkSizer; each size sent is recorded in the run metrics.
+    """
+
+    def __init__(self, state_path=TUS_STATE_FILE, bandwidth=None, sizer=None):
+        self.state_path = Path(state_path)
+        self.bandwidth = bandwidth
+        self.sizer = sizer or ChunkSizer()
+        self._lock = threading.Lock()
+        self._state = {}
+        if self.state_path.exists():
+            with open(self.state_path) as f:
+                self._state = json.load(f)
+
+    def _headers(self, **extra):
+        headers = {
+            'Tus-Resumable': '1.0.0'
         }
+        headers.update(extra)
+        return headers
+
+    def _update(self, object_name, entry):
+        """Set (or with None, drop) an object's entry and rewrite the state file."""
+        with self._lock:
+            if entry is None:
+                self._state.pop(object_name, None)
+            else:
+                self._state[object_name] = entry
+            tmp_path = self.state_path.with_suffix('.tmp')
+            with open(tmp_path, 'w') as f:
+                json.dump(self._state, f, indent=2)
+            os.replace(tmp_path, self.state_path)
+
+    def server_offset(self, upload_url):
+        """Ask the server how many bytes it has, or None if the upload is gone."""
+        started = time.monotonic()
+        response = client.request('HEAD', upload_url, headers=self._headers(), timeout=30)
+        if response.status_code in [403, 404, 410]:
+            return None
+        if response.status_code not in [200, 204]:
+            raise Exception(f'Failed to query upload offset: {response.status_code}')
+        self.sizer.request_time(time.monotonic() - started)
+        return int(response.headers['Upload-Offset'])
+
+    def resume(self, object_name, source):
+        """Return (offset, total length or None) to continue object_name from.
+
+        Returns (0, None) when there is no usable earlier upload of source.
+        """
+        entry = self._state.get(object_name)
+        if not entry or entry.get('source') != source:
+            return 0, None
+        offset = self.server_offset(entry['url'])
+        if offset is None:
+            self._update(object_name, None)
+            return 0, None
+        return offset, entry.get('length')
+
+    def finish(self, object_name):
+        self._update(object_name, None)
+
+    def create(self, object_name, source, total_size=None):
+        headers = self._headers(**{
+            'Upload-Metadata': f'bucketName {b64encode(BUCKET_NAME.encode()).decode()},'
+                               f'objectName {b64encode(object_name.encode()).decode()}',
+            'Content-Type': 'application/offset+octet-stream'
+        })
+        if total_size is not None:
+            headers['Upload-Length'] = str(total_size)
+        else:
+            # Size unknown until the download finishes; declared on the last PATCH
+            headers['Upload-Defer-Length'] = '1'
+
+        started = time.monotonic()
+        create_response = client.request('POST', '/storage/v1/upload/resumable', headers=headers)
+
+        if create_response.status_code not in [200, 201]:
+            raise Exception(f'Failed to create upload: {create_response.status_code} - {create_response.text}')
+        self.sizer.request_time(time.monotonic() - started)
+
+        self._update(object_name, {
+            'url': create_response.headers.get('Location'),
+            'source': source,
+            'length': total_size
+        })
+
+    def upload(self, object_name, chunks, offset=0, total_size=None, label=''):
+        """Send chunks to an already created upload starting at offset.
+
+        Returns the final offset, which is the object size once complete.
+        """
+        upload_url = self._state[object_name]['url']
+        deferred = self._state[object_name]['length'] is None
+
+        # Look one chunk ahead to spot the last one
+        chunks = iter(chunks)
+        chunk = next(chunks, None)
+
+        while chunk is not None:
+            next_chunk = next(chunks, None)
+            final_length = offset + len(chunk) if deferred and next_chunk is None else None
+            offset = self._patch(upload_url, chunk, offset, final_length)
+
+            if total_size:
+                progress = (offset / total_size) * 100
+                print(f'    {label}Progress: {progress:.1f}%')
+            else:
+                print(f'    {label}Progress: {offset / 1024 / 1024:.1f} MB')
+            chunk = next_chunk
+
+        return offset
+
+    def _patch(self, upload_url, chunk, offset, final_length=None):
+        """PATCH one chunk, resending only what the server is missing on failure."""
+        start = offset
+        end = start + len(chunk)
+
+        for attempt in range(TUS_RETRIES + 1):
+            data = chunk if offset == start else memoryview(chunk)[offset - start:]
+            patch_headers = self._headers(**{
+                'Upload-Offset': str(offset),
+                'Content-Type': 'application/offset+octet-stream',
+                'Content-Length': str(len(data))
+            })
+            if final_length is not None:
+                patch_headers['Upload-Length'] = str(final_length)
+            if self.bandwidth:
+                self.bandwidth.consume(len(data))
+
+            started = time.monotonic()
+            try:
+                # Retries happen below, resynced to the server's offset
+                patch_response = client.request('PATCH', upload_url, headers=patch_headers, body=data,
+                                                timeout=300, retries=0)
+                if patch_response.status_code in [200, 201, 204]:
+                    self.sizer.success(len(data), time.monotonic() - started)
+                    metrics.observe('tus_chunk_bytes', len(data))
+                    return end
+                error = f'{patch_response.status_code} - {patch_response.text}'
+                if patch_response.status_code in [404, 410]:
+                    raise Exception(f'Upload expired on the server: {error}')
+            except RequestError as e:
+                error = str(e)
+            self.sizer.failure(len(data))
+
+            if attempt == TUS_RETRIES:
+                break
+
+            delay = min(TUS_BACKOFF_MAX, TUS_BACKOFF * 2 ** attempt)
+            metrics.retry('PATCH', upload_url, attempt + 1, error, delay)
+            print(f'    Chunk at {offset} failed ({error}), retrying in {delay:.0f}s')
+            time.sleep(delay)
+
+            recovered = self.server_offset(upload_url)
+            if recovered is None:
+                raise Exception('Upload expired on the server')
+            if not start <= recovered <= end:
+                raise Exception(f'Server offset {recovered} is outside the chunk {start}-{end}')
+            offset = recovered
+            if offset == end and final_length is None:
+                return end
+
+        raise Exception(f'Failed to upload chunk: {error}')
+
+def keep_header(chunks, head):
+    """Pass chunks through, saving the MP3 headers from the first one into head."""
+    for chunk in chunks:
+        if not head:
+            head.append(chunk[:id3v2_size(chunk) + SCAN_SIZE])
+        yield chunk
+
+def probe_metadata(file_id, size, cache=None):
+    """MP3 metadata read from the start of a Drive file, or None.
+
+    A cached copy is read if there is one, but the probe never stores the
+    file, since it stops after the headers.
+    """
+    try:
+        _, chunks = download_file(file_id, cache=cache, fill_cache=False)
+        try:
+            return scan_stream(chunks, size)
+        finally:
+            chunks.close()
+    except Exception:
+        return None
 
-        patch_response = requests.patch(upload_url, headers=patch_headers, data=chunk)
-
-        if patch_response.status_code not in [200, 201, 204]:
-            raise Exception(f'Failed to upload chunk: {patch_response.status_code} - {patch_response.text}')
-
-        offset += len(chunk)
-        progress = (offset / len(file_data)) * 100
-        print(f'    Progress: {progress:.1f}%')
-
-    return storage_path
-
-def create_db_record(file_path, file_id, track_num):
-    """Create database record for the track"""
-    url = f'{SUPABASE_URL}/rest/v1/audio_tracks'
-    headers = {
-        'Authorization': f'Bearer {SUPABASE_KEY}',
-        'apikey': SUPABASE_KEY,
-        'Content-Type': 'application/json',
-        'Prefer': 'return=minimal'
-    }
+def upload_to_supabase_chunked(tus, limits, file_id, file_name, cache=None):
+    """Stream a Drive file to Supabase, resuming an earlier partial upload.
 
-    data = {
+    Returns (storage path, bytes uploaded, MP3 metadata or None).
+    """
+    storage_path = f'audio-tracks/{file_name}'
+    label = f'{file_name}: '
+
+    # Take the upload slot first so an open Drive stream never sits idle
+    # waiting for one; the download slot is freed once the stream ends.
+    with limits.uploads:
+        offset, length = tus.resume(storage_path, file_id)
+        if length is not None and offset == length:
+            tus.finish(storage_path)
+            return storage_path, offset, probe_metadata(file_id, offset, cache)
+        if offset:
+            print(f'  {label}Resuming earlier upload at {offset / 1024 / 1024:.2f} MB')
+
+        limits.downloads.acquire()
+        try:
+            size, chunks = download_file(file_id, offset, tus.sizer, cache)
+        except BaseException:
+            limits.downloads.release()
+            raise
+        chunks = SlotStream(chunks, limits.downloads)
+        head = []
+
+        pipeline = prefetch(keep_header(chunks, head))
+        try:
+            if not offset:
+                tus.create(storage_path, file_id, size)
+            uploaded = tus.upload(storage_path, pipeline, offset, size, label)
+        finally:
+            # Stop the prefetch thread before closing the stream it reads
+            try:
+                pipeline.close()
+            finally:
+                chunks.close()
+        tus.finish(storage_path)
+
+    # A resumed upload never saw the start of the file, so fetch it again
+    info = scan_stream(head, uploaded) if head and not offset else probe_metadata(file_id, uploaded, cache)
+    return storage_path, uploaded, info
+
+def track_record(file_path, file_id, track_num, info=None):
+    """Build the audio_tracks row for an uploaded track.
+
+    info is the ingest_mp3 header metadata; without it duration_seconds is
+    left at 0 so a backfill can find the row.
+    """
+    return {
         'channel_id': CHANNEL_ID,
         'energy_level': 'medium',
         'file_path': file_path,
-        'duration_seconds': 180,
+        'duration_seconds': round(info['duration']) if info else 0,
         'metadata': {
             'source': 'google_drive_uploaded',
             'file_id': file_id,
-            'track_number': track_num
+            'track_number': track_num,
+            **(info or {})
         }
     }
 
-    response = requests.post(url, headers=headers, json=data)
-    return response.status_code in [200, 201]
+def probe_size(file_id):
+    """Size of a Drive file from a HEAD request, or None if Drive won't say."""
+    return drive_head(file_id)[0]
 
-def main():
-    print(f'Uploading {len(FILE_IDS)} files to Supabase storage...\n')
+def process_file(tus, limits, writer, file_id, file_num, total, cache=None):
+    """Run the download -> upload -> DB record pipeline for one file."""
+    file_name = f'track_{file_num:03d}.mp3'
+    label = f'[{file_num}/{total}] {file_name}'
 
-    success = 0
-    failed = 0
+    print(f'{label}: streaming from Google Drive to Supabase (resumable)...')
+    started = time.monotonic()
 
-    for idx, file_id in enumerate(FILE_IDS):
-        file_num = idx + 1
-        file_name = f'track_{file_num:03d}.mp3'
+    try:
+        storage_path, uploaded, info = upload_to_supabase_chunked(tus, limits, file_id, file_name, cache)
+        metrics.file_done(storage_path, uploaded, seconds=time.monotonic() - started)
+        print(f'{label}: ✓ Uploaded {uploaded / 1024 / 1024:.2f} MB to storage')
+        if info:
+            print(f'{label}: {info["duration"]:.1f}s, {info["bitrate"] // 1000} kbps, '
+                  f'{info["sample_rate"]} Hz, {info["channels"]} ch')
+        else:
+            print(f'{label}: ⚠ No MP3 frame headers found; duration left at 0')
 
-        print(f'[{file_num}/{len(FILE_IDS)}] Processing {file_name}...')
+        writer.add(track_record(storage_path, file_id, file_num, info))
 
-        try:
-            print('  Downloading from Google Drive...')
-            file_data = download_file(file_id)
-            print(f'  Downloaded {len(file_data) / 1024 / 1024:.2f} MB')
+        return True
 
-            print('  Uploading to Supabase (resumable)...')
-            storage_path = upload_to_supabase_chunked(file_data, file_name)
-            print('  ✓ Uploaded to storage')
+    except Exception as e:
+        metrics.file_done(file_name, 0, ok=False, seconds=time.monotonic() - started, error=str(e))
+        print(f'{label}: ✗ Error: {str(e)}')
+        return False
 
-            if create_db_record(storage_path, file_id, file_num):
-                print('  ✓ Database record created')
-            else:
-                print('  ⚠ Database record may already exist')
+def main():
+    parser = argparse.ArgumentParser(description='Migrate the FILE_IDS tracks from Google Drive to Supabase storage.')
+    parser.add_argument('--parallel', type=int, default=1, metavar='N',
+                        help='number of files processed at once (default: 1)')
+    parser.add_argument('--max-downloads', type=int, metavar='N',
+                        help='cap on concurrent Google Drive downloads (default: --parallel)')
+    parser.add_argument('--max-uploads', type=int, metavar='N',
+                        help='cap on concurrent TUS uploads (default: --parallel)')
+    parser.add_argument('--bandwidth', type=float, metavar='MB/S',
+                        help='cap on total upload bandwidth in MB/s (default: unlimited)')
+    parser.add_argument('--chunk-mb', type=float, metavar='MB',
+                        help='fixed TUS chunk size, disabling adaptive sizing (Supabase documents 6)')
+    parser.add_argument('--chunk-min-mb', type=float, default=CHUNK_MIN / 1024 / 1024, metavar='MB',
+                        help=f'smallest adaptive chunk (default: {CHUNK_MIN // 1024 // 1024})')
+    parser.add_argument('--chunk-max-mb', type=float, default=CHUNK_MAX / 1024 / 1024, metavar='MB',
+                        help=f'largest adaptive chunk (default: {CHUNK_MAX // 1024 // 1024})')
+    parser.add_argument('--chunk-buffer-mb', type=float, default=CHUNK_BUFFER_BUDGET / 1024 / 1024, metavar='MB',
+                        help=f'memory each upload may use for buffered chunks; lowers the largest adaptive '
+                             f'chunk, but not below {CHUNK_RANGE}x the smallest '
+                             f'(default: {CHUNK_BUFFER_BUDGET // 1024 // 1024})')
+    parser.add_argument('--cache-dir', default=CACHE_DIR, metavar='DIR',
+                        help=f'where downloaded Drive files are kept for later runs (default: {CACHE_DIR})')
+    parser.add_argument('--cache-gb', type=float, default=CACHE_MAX_GB, metavar='GB',
+                        help=f'size cap of the download cache; least recently used files go first '
+                             f'(default: {CACHE_MAX_GB:g})')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='always download from Drive and leave the cache alone')
+    args = parser.parse_args()
+
+    limits = TransferLimits(
+        args.max_downloads or args.parallel,
+        args.max_uploads or args.parallel,
+        args.bandwidth * 1024 * 1024 if args.bandwidth else None
+    )
+    if args.chunk_mb:
+        sizer = ChunkSizer(int(args.chunk_mb * 1024 * 1024), fixed=True)
+    else:
+        # Keep an upload's worst case (every buffer holding a full-size chunk)
+        # within the budget, but leave the sizer room above the minimum
+        minimum = int(args.chunk_min_mb * 1024 * 1024)
+        maximum = min(int(args.chunk_max_mb * 1024 * 1024),
+                      max(minimum * CHUNK_RANGE, int(args.chunk_buffer_mb * 1024 * 1024) // PIPE_CHUNKS))
+        sizer = ChunkSizer(minimum=minimum, maximum=max(minimum, maximum))
+    tus = TusClient(bandwidth=limits.bandwidth, sizer=sizer)
+    cache = None
+    if not args.no_cache and args.cache_gb > 0:
+        cache = DriveCache(args.cache_dir, int(args.cache_gb * 1024 ** 3))
+
+    # Keep each file's track number from its FILE_IDS position
+    jobs = list(enumerate(FILE_IDS, 1))
+    total_size = None
+
+    if args.parallel > 1:
+        # Start the largest files first so they don't make up the tail
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            sizes = dict(zip(FILE_IDS, pool.map(probe_size, FILE_IDS)))
+        jobs.sort(key=lambda job: sizes[job[1]] or 0, reverse=True)
+        if all(sizes.values()):
+            total_size = sum(sizes.values())
 
-            success += 1
+    print(f'Uploading {len(FILE_IDS)} files to Supabase storage...\n')
 
-        except Exception as e:
-            print(f'  ✗ Error: {str(e)}')
-            failed += 1
+    with AudioTrackWriter(client) as writer:
+        with metrics.phase('upload', files=len(FILE_IDS), size=total_size):
+            with ThreadPoolExecutor(max_workers=args.parallel) as pool:
+                results = list(pool.map(
+                    lambda job: process_file(tus, limits, writer, job[1], job[0], len(FILE_IDS), cache), jobs))
+        with metrics.phase('db-write'):
+            writer.flush()
 
-        print()
+    success = sum(results)
+    failed = len(results) - success
 
+    print()
     print('=' * 40)
     print('Upload Complete!')
     print(f'Success: {success} files')
     print(f'Failed: {failed} files')
+    if cache:
+        print(f'Drive cache: {cache.summary()}')
+    writer.report()
+    metrics.report()
     print('=' * 40)
 
 if __name__ == '__main__':